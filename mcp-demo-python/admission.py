@@ -0,0 +1,156 @@
+"""
+Admission Control
+ASGI middleware that caps concurrent requests per route class, queues a
+bounded number of extras and sheds the rest early with 429/503 instead of
+letting everything slow down together
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+# Header carrying how many seconds the caller will wait for an answer
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+class AdmissionClass:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        """
+        Args:
+            name: Label used in metrics
+            max_concurrency: Requests of this class running at once
+            max_queue: Requests allowed to wait for a slot; more are rejected with 429
+            queue_timeout: Longest a request waits for a slot before a 503
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.service_time = 0.0  # moving average of seconds per admitted request
+        self._waiters = deque()
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "shed_deadline": 0}
+
+    async def acquire(self, deadline: float) -> Optional[int]:
+        """
+        Wait for a slot until deadline
+
+        Returns:
+            None once admitted, otherwise the HTTP status to reject with
+        """
+        # Don't start work that can't finish before the caller gives up
+        if deadline - self.service_time <= time.monotonic():
+            self.stats["shed_deadline"] += 1
+            return 503
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            return 429
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (deadline, waiter)
+        self._waiters.append(entry)
+        try:
+            admitted = await asyncio.wait_for(waiter, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            admitted = False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()  # slot was handed over just as we were cancelled
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+        if not admitted:
+            self.stats["shed_deadline"] += 1
+            return 503
+        self.stats["admitted"] += 1
+        return None
+
+    def release(self):
+        """Hand the slot to the next waiter that can still make its deadline"""
+        now = time.monotonic()
+        while self._waiters:
+            deadline, waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            if deadline - self.service_time <= now:
+                waiter.set_result(False)
+                continue
+            waiter.set_result(True)
+            return
+        self.active -= 1
+
+    def record(self, seconds: float):
+        self.service_time = seconds if not self.service_time else 0.9 * self.service_time + 0.1 * seconds
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = len(self._waiters) + self.active
+        return max(1, math.ceil(backlog * self.service_time / self.max_concurrency))
+
+
+class AdmissionControl:
+    def __init__(self, app, classes: Dict[str, AdmissionClass],
+                 classify: Callable[[str, str], Optional[str]]):
+        """
+        Args:
+            app: Wrapped ASGI application
+            classes: Admission classes by name
+            classify: Maps (method, path) to a class name; None bypasses admission
+        """
+        self.app = app
+        self.classes = classes
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = self.classify(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        admission = self.classes[name]
+        timeout = admission.queue_timeout + admission.service_time
+        for header, value in scope["headers"]:
+            if header == TIMEOUT_HEADER:
+                try:
+                    timeout = min(timeout, float(value))
+                except ValueError:
+                    pass
+                break
+
+        status = await admission.acquire(time.monotonic() + timeout)
+        if status is not None:
+            return await self._reject(send, status, admission)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.record(time.monotonic() - started)
+            admission.release()
+
+    @staticmethod
+    async def _reject(send, status: int, admission: AdmissionClass):
+        body = json.dumps({
+            "success": False,
+            "error": "Server busy, please retry shortly" if status == 429
+                     else "Request could not be served in time, please retry shortly",
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(admission.retry_after()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
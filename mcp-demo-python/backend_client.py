@@ -0,0 +1,250 @@
+"""
+Backend API Client
+Async client the MCP server uses to reach the hotel & weather API, with
+per-tool latency budgets, hedged and coalesced reads, safe retries and a
+circuit breaker
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+import httpx
+
+from single_flight import AsyncSingleFlight, make_key
+
+
+class BackendUnavailable(Exception):
+    """The API is failing, too slow for the tool's budget, or the circuit is open"""
+
+
+def _body(response: httpx.Response):
+    """JSON body, or the status line when the API answered with something else"""
+    try:
+        return response.json()
+    except ValueError:
+        return {"detail": f"HTTP {response.status_code} {response.reason_phrase}".strip()}
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """Rolling window of recent successful request latencies"""
+        self._samples = deque(maxlen=window)
+        self._min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-100), or None until enough samples are in"""
+        if len(self._samples) < self._min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before letting one trial call through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a new call may go to the backend"""
+        if self.opened_at is None:
+            return True
+        if not self._trial_in_flight and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._trial_in_flight = True  # half-open: one call decides
+            return True
+        return False
+
+    def abandon_trial(self):
+        """The trial call ended without an answer (cancelled, out of budget): let the next call try"""
+        self._trial_in_flight = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class BackendClient:
+    def __init__(self, base_url: str, budgets: Optional[Dict[str, float]] = None,
+                 default_budget: float = 10.0, max_attempts: int = 3,
+                 hedge_percentile: float = 95, hedge_default: float = 0.5,
+                 hedge_floor: float = 0.02, retry_backoff: float = 0.1,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            base_url: API root, e.g. http://127.0.0.1:8000
+            budgets: Total seconds each tool may spend on the backend, retries included
+            default_budget: Budget for tools not listed in budgets
+            max_attempts: Attempts per call, including the first
+            hedge_percentile: Latency percentile after which a read is hedged
+            hedge_default: Hedge delay used until enough latencies are recorded
+            hedge_floor: Never hedge sooner than this
+            retry_backoff: Base delay between attempts, doubled each time
+        """
+        self.base_url = base_url
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.max_attempts = max_attempts
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default = hedge_default
+        self.hedge_floor = hedge_floor
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.latency: Dict[str, LatencyTracker] = defaultdict(LatencyTracker)
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "retries": 0, "short_circuited": 0}
+        self.single_flight = AsyncSingleFlight()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.base_url)
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def request(self, tool: str, method: str, path: str, *, idempotent: bool,
+                      idempotency_key: Optional[str] = None, **kwargs) -> dict:
+        """
+        Call the API and return its JSON body
+
+        Reads (idempotent=True) are coalesced with identical reads already
+        in flight, hedged and retried. Writes are only retried when an
+        idempotency_key is given, which the API uses to return the original
+        result instead of repeating the write.
+
+        Raises:
+            BackendUnavailable: circuit open, budget exhausted or every attempt failed
+        """
+        if idempotent:
+            # Hotel names and IDs are case-sensitive; only locations are free text
+            key = make_key(f"{method} {path}", fold_case=("location",),
+                           params=kwargs.get("params"), json=kwargs.get("json"))
+            return await self.single_flight.do(
+                key, lambda: self._request(tool, method, path, idempotent=True, **kwargs)
+            )
+        return await self._request(tool, method, path, idempotent=False,
+                                   idempotency_key=idempotency_key, **kwargs)
+
+    async def _request(self, tool: str, method: str, path: str, *, idempotent: bool,
+                       idempotency_key: Optional[str] = None, **kwargs) -> dict:
+        self.stats["calls"] += 1
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise BackendUnavailable("Backend unavailable, please try again shortly")
+        # Let through while open: this call is the half-open trial. However it
+        # ends, the breaker must not be left waiting on it forever
+        trial = self.breaker.is_open
+        try:
+            return await self._attempts(tool, method, path, idempotent=idempotent,
+                                        idempotency_key=idempotency_key, **kwargs)
+        finally:
+            if trial:
+                self.breaker.abandon_trial()
+
+    async def _attempts(self, tool: str, method: str, path: str, *, idempotent: bool,
+                        idempotency_key: Optional[str] = None, **kwargs) -> dict:
+        if idempotency_key:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Idempotency-Key": idempotency_key}
+        attempts = self.max_attempts if idempotent or idempotency_key else 1
+        deadline = time.monotonic() + self.budgets.get(tool, self.default_budget)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self.stats["retries"] += 1
+            try:
+                if idempotent:
+                    response = await self._hedged(tool, method, path, remaining, **kwargs)
+                else:
+                    response = await self._send(tool, method, path, remaining, **kwargs)
+                self.breaker.success()
+                return _body(response)
+            except (httpx.TransportError, httpx.HTTPStatusError, asyncio.TimeoutError) as e:
+                last_error = e
+                self.breaker.failure()
+                if self.breaker.is_open:
+                    break
+                backoff = self.retry_backoff * (2 ** attempt)
+                await asyncio.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+
+        reason = type(last_error).__name__ if last_error else "latency budget exceeded"
+        raise BackendUnavailable(f"Backend request failed ({reason})")
+
+    async def _send(self, tool: str, method: str, path: str, timeout: float, **kwargs) -> httpx.Response:
+        started = time.monotonic()
+        # Tell the API how long we'll wait so it can shed instead of working for nobody
+        headers = {**kwargs.pop("headers", {}), "X-Request-Timeout": f"{timeout:.3f}"}
+        response = await self._client().request(method, path, timeout=timeout, headers=headers, **kwargs)
+        # A response carrying Retry-After is the API shedding load: retrying now would add to it
+        if "retry-after" in response.headers:
+            return response
+        if response.status_code >= 500:
+            response.raise_for_status()
+        self.latency[tool].record(time.monotonic() - started)
+        return response
+
+    def hedge_delay(self, tool: str) -> float:
+        observed = self.latency[tool].percentile(self.hedge_percentile)
+        return max(self.hedge_floor, self.hedge_default if observed is None else observed)
+
+    async def _hedged(self, tool: str, method: str, path: str, timeout: float, **kwargs) -> httpx.Response:
+        """Send once, and again if the first hasn't answered by the hedge delay; first success wins"""
+        deadline = time.monotonic() + timeout
+        first = asyncio.create_task(self._send(tool, method, path, timeout, **kwargs))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=min(self.hedge_delay(tool), timeout))
+            if done:
+                return first.result()
+
+            self.stats["hedged"] += 1
+            remaining = deadline - time.monotonic()
+            second = asyncio.create_task(self._send(tool, method, path, remaining, **kwargs))
+            pending.add(second)
+            error: Optional[BaseException] = None
+            while pending:
+                remaining = deadline - time.monotonic()
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, remaining),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                # Look at every finished task, so a failure finishing alongside
+                # the winner is still retrieved rather than logged as unhandled
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    if first not in winners:
+                        self.stats["hedge_wins"] += 1
+                    return (first if first in winners else second).result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
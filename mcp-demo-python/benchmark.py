@@ -0,0 +1,978 @@
+"""
+Benchmarks for the hotel and weather services
+
+Usage:
+    python benchmark.py workers --max-workers 8 --seconds 3
+    python benchmark.py tool-output
+    python benchmark.py lookup --hotels 1000000
+    python benchmark.py resilience
+    python benchmark.py coalescing
+    python benchmark.py overload
+    python benchmark.py weather
+    python benchmark.py search-cache
+    python benchmark.py geo --hotels 1000000
+    python benchmark.py catalog --hotels 1000000
+    python benchmark.py chat-history --hotels 500 --turns 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+
+from catalog import write_catalog
+from hotel import Hotel
+from hotel_index import HotelNameIndex
+from geo_index import GeoIndex, haversine_km
+from inventory import Inventory
+from weather import Weather
+
+
+# ------------------ SHARED INVENTORY ------------------ #
+
+def _worker_loop(db_path: str, op: str, seconds: float, start, results):
+    # Without the search cache every search reads the shared inventory
+    hotel = Hotel(db_path=db_path, search_cache_size=0)
+    start.wait()
+    done = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if op == "book":
+            result = hotel.book_hotel("hotel_001", "2025-03-01", "2025-03-03", 1,
+                                      "Bench Guest", "bench@example.com")
+        else:
+            result = hotel.search_hotels("New York", "2025-03-01", "2025-03-03", 1)
+        if result["success"]:
+            done += 1
+    results.put(done)
+
+
+def _run_workers(db_path: str, op: str, workers: int, seconds: float) -> int:
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_worker_loop, args=(db_path, op, seconds, start, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    time.sleep(0.5)  # let every worker open the database first
+    start.set()
+    total = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total
+
+
+def bench_workers(max_workers: int, seconds: float):
+    """Booking and search throughput against one SQLite inventory from 1..N processes"""
+    print(f"{'workers':>8} {'book/s':>10} {'search/s':>10} {'rooms ok':>9}")
+    for workers in range(1, max_workers + 1):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "inventory.db")
+            start_rooms = 10**9
+            # Pre-seed a huge room count so bookings never run out mid-run
+            Inventory(db_path).seed((h["id"], start_rooms) for h in Hotel().hotels)
+            booked = _run_workers(db_path, "book", workers, seconds)
+            searched = _run_workers(db_path, "search", workers, seconds)
+            left = Inventory(db_path).available_rooms(["hotel_001"])["hotel_001"]
+            consistent = start_rooms - left == booked
+            print(f"{workers:>8} {booked / seconds:>10.0f} {searched / seconds:>10.0f} {str(consistent):>9}")
+
+
+# ------------------ MCP TOOL OUTPUT SIZE ------------------ #
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _approx_tokens(text: str) -> int:
+    """Rough token count: one per word and one per symbol/emoji"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def bench_tool_output():
+    """Bytes and approximate tokens of each tool's whole serialized result, per format"""
+    import mcp.types
+    import mcp_server_fastmcp as server  # needs fastmcp installed
+
+    hotel, weather = Hotel(), Weather()
+    search = hotel.search_hotels("New York", "2025-03-01", "2025-03-03", 1)
+    booking = hotel.book_hotel("hotel_001", "2025-03-01", "2025-03-03", 1, "Jane Doe", "jane@example.com")
+    samples = [
+        ("search_hotels", search, server._fmt_hotels, server._summarize_hotels),
+        ("get_hotel", hotel.lookup_hotels("Grand Plaza"), server._fmt_hotel_lookup, server._summarize_hotel_lookup),
+        ("book_hotel", booking, server._fmt_booking, server._summarize_booking),
+        ("get_booking", hotel.get_booking(booking["booking"]["booking_id"]), server._fmt_booking,
+         server._summarize_booking),
+        ("get_current_weather", weather.get_current_weather("Denver"), server._format_current_weather,
+         server._summarize_current_weather),
+        ("get_weather_forecast", weather.get_forecast("Denver", 7), lambda d: server._format_weather_forecast(d, 7),
+         server._summarize_weather_forecast),
+        ("get_weather_alerts", weather.get_weather_alerts("Miami"), server._format_weather_alerts,
+         server._summarize_weather_alerts),
+    ]
+
+    # What goes over the wire: the CallToolResult with the text block and the
+    # structured content. The baseline is the original server's result, the
+    # markdown text on its own.
+    def wire_bytes(content, structured=None) -> str:
+        wire = mcp.types.CallToolResult(content=content, structuredContent=structured, isError=False)
+        return wire.model_dump_json(by_alias=True, exclude_none=True)
+
+    formats = ("summary", "markdown", "json")
+    print(f"{'':<22} {'baseline B':>10} {'tok':>5}" + "".join(f" {mode + ' B':>12} {'tok':>5} {'x':>5}" for mode in formats))
+    for name, data, render, summarize in samples:
+        baseline = wire_bytes([mcp.types.TextContent(type="text", text=render(data))])
+        row = f"{name:<22} {len(baseline.encode()):>10} {_approx_tokens(baseline):>5}"
+        for mode in formats:
+            serialized = wire_bytes(*server._result(data, mode, render, summarize).to_mcp_result())
+            ratio = len(serialized.encode()) / len(baseline.encode())
+            row += f" {len(serialized.encode()):>12} {_approx_tokens(serialized):>5} {ratio:>5.2f}"
+        print(row)
+
+
+# ------------------ HOTEL NAME LOOKUP ------------------ #
+
+_BRANDS = ["Grand", "Royal", "Sunset", "Harbor", "Mountain", "City", "Luxury", "Garden",
+           "Riverside", "Park", "Central", "Golden", "Silver", "Ocean", "Lakeview", "Heritage"]
+_WORDS = ["Plaza", "View", "Center", "Bay", "Point", "Square", "Crest", "Ridge", "Meadow",
+          "Harbour", "Springs", "Gate", "Court", "Tower", "Palace", "Heights"]
+_KINDS = ["Hotel", "Inn", "Lodge", "Resort", "Suites", "Motel", "Hostel", "Residences"]
+_CITY_CENTERS = {
+    "New York": (40.7128, -74.0060), "Miami": (25.7617, -80.1918), "Denver": (39.7392, -104.9903),
+    "Chicago": (41.8781, -87.6298), "Los Angeles": (34.0522, -118.2437), "Seattle": (47.6062, -122.3321),
+    "Phoenix": (33.4484, -112.0740), "Boston": (42.3601, -71.0589), "San Francisco": (37.7749, -122.4194),
+    "Atlanta": (33.7490, -84.3880),
+}
+_CITIES = list(_CITY_CENTERS)
+
+
+def synthetic_hotels(count: int, seed: int = 7) -> list:
+    """Catalog entries shaped like Hotel.hotels with unique, partly distinctive names"""
+    rng = random.Random(seed)
+    hotels = []
+    for i in range(count):
+        city = rng.choice(_CITIES)
+        hotels.append({
+            "id": f"hotel_{i:07d}",
+            "name": f"{rng.choice(_BRANDS)} {rng.choice(_WORDS)} {rng.choice(_KINDS)} {city.split()[0]} {i:x}",
+            "location": city,
+            "price_per_night": round(rng.uniform(60, 600), 2),
+            "rating": round(rng.uniform(2.5, 5.0), 1),
+            "amenities": ["WiFi"],
+            "available_rooms": rng.randint(0, 40),
+            # Dense downtown, thinning out over ~50 km
+            "latitude": round(_CITY_CENTERS[city][0] + rng.gauss(0, 0.15), 6),
+            "longitude": round(_CITY_CENTERS[city][1] + rng.gauss(0, 0.15), 6),
+        })
+    return hotels
+
+
+def _percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    return f"p50 {p50 * 1e3:.3f} ms  p99 {p99 * 1e3:.3f} ms"
+
+
+def bench_lookup(count: int, queries: int):
+    """Name index build time and lookup latency for exact, prefix, misspelled and common-word names"""
+    hotels = synthetic_hotels(count)
+    started = time.perf_counter()
+    index = HotelNameIndex(hotels)
+    print(f"built index over {count} hotels in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(11)
+    picks = [hotels[rng.randrange(count)] for _ in range(queries)]
+    cases = {
+        "exact name": [h["name"] for h in picks],
+        "hotel id": [h["id"] for h in picks],
+        "prefix": [h["name"].rsplit(" ", 1)[0] + " " + h["name"].rsplit(" ", 1)[1][:3] for h in picks],
+        "misspelled": [h["name"].replace("a", "e", 1) for h in picks],
+    }
+    for label, names in cases.items():
+        timings, hits = [], 0
+        for hotel, name in zip(picks, names):
+            started = time.perf_counter()
+            found = index.lookup(name, limit=5)
+            timings.append(time.perf_counter() - started)
+            hits += any(c["id"] == hotel["id"] for c in found)
+        print(f"{label:<12} {_percentiles(timings)}  top-5 recall {hits / len(picks):.0%}")
+
+    # Without the unique suffix every word is shared by thousands of hotels,
+    # so any hotel whose name holds all of them is a right answer
+    shared = {
+        "common words": [h["name"].rsplit(" ", 1)[0] for h in picks],
+        "two words": [" ".join(h["name"].split()[1:3]) for h in picks],
+        "generic word": [h["name"].split()[2] for h in picks],
+    }
+    for label, names in shared.items():
+        timings, hits = [], 0
+        for name in names:
+            started = time.perf_counter()
+            found = index.lookup(name, limit=5)
+            timings.append(time.perf_counter() - started)
+            hits += bool(found) and set(name.split()) <= set(found[0]["name"].split())
+        print(f"{label:<12} {_percentiles(timings)}  top-1 has every word {hits / len(names):.0%}")
+
+
+# ------------------ MCP -> API RESILIENCE ------------------ #
+
+class _FaultyBackend(BaseHTTPRequestHandler):
+    """Stub API: answers fast, but stalls or fails a configurable share of requests"""
+    slow_rate = 0.03
+    slow_seconds = 2.0
+    fail_rate = 0.02
+    post_seconds = 0.0
+    down = False
+    gets = 0
+    bookings = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        with self.lock:
+            _FaultyBackend.gets += 1
+        if self.down or random.random() < self.fail_rate:
+            return self._reply(503, {"detail": "injected failure"})
+        if random.random() < self.slow_rate:
+            time.sleep(self.slow_seconds)
+        time.sleep(0.005)
+        self._reply(200, {"success": True, "weather": {"location": "Denver"}})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.post_seconds)
+        key = self.headers.get("Idempotency-Key")
+        with self.lock:
+            first_time = key not in self.bookings
+            booking_id = self.bookings.setdefault(key, f"B{len(self.bookings):05d}")
+        if first_time:
+            # Book, then lose the response: the client has to retry
+            return self._reply(503, {"detail": "injected failure after commit"})
+        self._reply(200, {"success": True, "booking": {"booking_id": booking_id}})
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # cancelled hedges close their connection mid-response
+
+
+async def _timed_calls(client, count: int, concurrency: int) -> list:
+    from backend_client import BackendUnavailable
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                # Distinct params per call: identical concurrent reads would be
+                # coalesced, and this measures hedging and retries per request
+                await client.request("bench", "GET", "/weather/current", idempotent=True,
+                                     params={"location": "Denver", "request": i})
+            except BackendUnavailable:
+                pass
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(i) for i in range(count)))
+
+
+def bench_resilience(count: int, concurrency: int):
+    """Read latency with and without hedging/retries, circuit breaking and idempotent booking retries"""
+    from backend_client import BackendClient, CircuitBreaker
+
+    server = _QuietServer(("127.0.0.1", 0), _FaultyBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    random.seed(3)
+
+    configs = {
+        "plain": dict(max_attempts=1, hedge_default=60.0, hedge_floor=60.0),
+        "retry only": dict(hedge_default=60.0, hedge_floor=60.0),
+        "hedged+retry": dict(),
+    }
+    for label, options in configs.items():
+        async def run():
+            client = BackendClient(base_url, budgets={"bench": 5.0},
+                                   breaker=CircuitBreaker(failure_threshold=10**6), **options)
+            await _timed_calls(client, 100, concurrency)  # warm up the latency window
+            started = time.perf_counter()
+            timings = await _timed_calls(client, count, concurrency)
+            elapsed = time.perf_counter() - started
+            await client.aclose()
+            return timings, elapsed, client.stats
+        timings, elapsed, stats = asyncio.run(run())
+        timings.sort()
+        print(f"{label:<13} {_percentiles(timings)}  max {timings[-1] * 1e3:.0f} ms"
+              f"  {count / elapsed:.0f} req/s  {stats}")
+
+    async def run_down():
+        _FaultyBackend.down = True
+        client = BackendClient(base_url, budgets={"bench": 5.0},
+                               breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0))
+        timings = await _timed_calls(client, 50, 1)
+        await client.aclose()
+        _FaultyBackend.down = False
+        return timings, client.stats
+    timings, stats = asyncio.run(run_down())
+    print(f"{'backend down':<13} first call {timings[0] * 1e3:.0f} ms, "
+          f"last call {timings[-1] * 1e3:.2f} ms  short-circuited {stats['short_circuited']}/50")
+
+    async def run_bookings():
+        client = BackendClient(base_url)
+        results = [await client.request("book_hotel", "POST", "/hotel/book", idempotent=False,
+                                        idempotency_key=f"key-{i}", json={})
+                   for i in range(20)]
+        await client.aclose()
+        return results
+    results = asyncio.run(run_bookings())
+    print(f"{'bookings':<13} 20 tool calls, {len(_FaultyBackend.bookings)} booked, "
+          f"{sum(r['success'] for r in results)} confirmed after retry")
+
+    async def run_cancelled_trial():
+        # Open the circuit, then cancel the half-open trial: a booking, which
+        # isn't coalesced, so the cancellation reaches the trial itself
+        _FaultyBackend.down = True
+        client = BackendClient(base_url, budgets={"bench": 5.0},
+                               breaker=CircuitBreaker(failure_threshold=5, reset_timeout=0.2))
+        await _timed_calls(client, 10, 1)
+        opened = client.breaker.is_open
+        await asyncio.sleep(0.25)
+        _FaultyBackend.post_seconds = 1.0
+        try:
+            await asyncio.wait_for(client.request("book_hotel", "POST", "/hotel/book", idempotent=False,
+                                                  idempotency_key="cancelled-trial", json={}), 0.1)
+        except asyncio.TimeoutError:
+            pass
+        _FaultyBackend.down = False
+        _FaultyBackend.post_seconds = 0.0
+        await _timed_calls(client, 1, 1)  # the next call becomes the trial and closes the circuit
+        await client.aclose()
+        return opened, client.breaker.is_open
+    opened, still_open = asyncio.run(run_cancelled_trial())
+    print(f"{'trial cancel':<13} circuit opened {opened}, closed again after the next call {not still_open}")
+    server.shutdown()
+
+
+# ------------------ REQUEST COALESCING ------------------ #
+
+def bench_coalescing(bursts: int, burst_size: int):
+    """Backend requests made for bursts of identical tool calls, MCP side and API side"""
+    from backend_client import BackendClient
+    from single_flight import SingleFlight, make_key
+
+    server = _QuietServer(("127.0.0.1", 0), _FaultyBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _FaultyBackend.slow_rate, _FaultyBackend.fail_rate, _FaultyBackend.gets = 0.0, 0.0, 0
+    cities = ["Denver", "Miami", "Chicago", "Boston"]
+
+    async def run():
+        client = BackendClient(f"http://127.0.0.1:{server.server_port}")
+        for _ in range(bursts):
+            await asyncio.gather(*(
+                client.request("get_current_weather", "GET", "/weather/current", idempotent=True,
+                               params={"location": cities[i % len(cities)]})
+                for i in range(burst_size)
+            ))
+        await client.aclose()
+        return client.single_flight.stats
+    stats = asyncio.run(run())
+    server.shutdown()
+    print(f"MCP server  {stats['calls']} tool calls -> {_FaultyBackend.gets} backend requests"
+          f"  ({stats['coalesced']} coalesced)")
+
+    weather, flight = Weather(), SingleFlight()
+    def generate(city):
+        time.sleep(0.005)  # stand-in for a slower data source
+        return weather.get_current_weather(city)
+    def caller(i):
+        city = cities[i % len(cities)]
+        flight.do(make_key("/weather/current", fold_case=("location",), location=city), lambda: generate(city))
+    for _ in range(bursts):
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(burst_size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    print(f"API         {flight.stats['calls']} requests -> {flight.stats['executed']} computations"
+          f"  ({flight.stats['coalesced']} coalesced)")
+
+
+# ------------------ ADMISSION CONTROL UNDER OVERLOAD ------------------ #
+
+class _RequestTimer:
+    """ASGI wrapper recording (status, seconds) of each request to one path, timed inside the server"""
+
+    def __init__(self, app, path: str, samples: list):
+        self.app = app
+        self.path = path
+        self.samples = samples
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = None
+
+        async def send_and_note(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_note)
+        finally:
+            self.samples.append((status, time.perf_counter() - started))
+
+
+def _overload_app(admission: bool, capacity: int, work_seconds: float):
+    """
+    FastAPI app whose /work route needs one of `capacity` backend slots for work_seconds
+
+    /work is timed inside the server, admission queueing included; GET
+    /samples returns the (status, seconds) recorded since the last call.
+    """
+    from fastapi import FastAPI
+    from admission import AdmissionClass, AdmissionControl
+
+    app = FastAPI()
+    slots = threading.BoundedSemaphore(capacity)
+    samples = []
+
+    @app.get("/work")
+    def work():
+        with slots:
+            time.sleep(work_seconds)
+        return {"success": True}
+
+    @app.get("/samples")
+    def take_samples():
+        taken = samples[:]
+        del samples[:len(taken)]
+        return taken
+
+    if admission:
+        classes = {"work": AdmissionClass("work", max_concurrency=capacity,
+                                          max_queue=2 * capacity, queue_timeout=0.5)}
+        app.add_middleware(AdmissionControl, classes=classes,
+                           classify=lambda method, path: "work" if path == "/work" else None)
+    return _RequestTimer(app, "/work", samples)
+
+
+def _overload_server(admission: bool, capacity: int, work_seconds: float, ports):
+    """Serve the overload app in this process, reporting the port it listens on"""
+    import socket
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(2048)
+    ports.put(sock.getsockname()[1])
+    app = _overload_app(admission, capacity, work_seconds)
+    uvicorn.Server(uvicorn.Config(app, log_level="error")).run(sockets=[sock])
+
+
+async def _open_loop(base_url: str, rate: float, seconds: float, client_timeout: float) -> tuple:
+    """
+    Fire requests at a fixed rate regardless of how fast they complete
+
+    Returns:
+            ([(status, seconds)], seconds it actually took to send them all)
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as http:
+        async def one():
+            started = time.perf_counter()
+            try:
+                # httpx's timeout is per connect/read/write step; the caller's
+                # budget covers the whole request
+                r = await asyncio.wait_for(http.get("/work", timeout=client_timeout,
+                                                    headers={"X-Request-Timeout": str(client_timeout)}),
+                                           client_timeout)
+                status = r.status_code
+            except (httpx.TimeoutException, asyncio.TimeoutError):
+                status = "timeout"
+            except httpx.TransportError:
+                status = "error"  # connection refused or reset under load
+            return status, time.perf_counter() - started
+
+        tasks = []
+        started = time.perf_counter()
+        for i in range(int(rate * seconds)):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one()))
+        sent_in = time.perf_counter() - started
+        return await asyncio.gather(*tasks), sent_in
+
+
+def bench_overload(capacity: int, work_ms: float, seconds: float):
+    """p99 of successful requests as offered load passes capacity, with and without admission control"""
+    import httpx
+
+    work_seconds = work_ms / 1000
+    max_rate = capacity / work_seconds
+    print(f"capacity ~{max_rate:.0f} req/s; server in its own process, latency of 200s as seen by "
+          f"the client and inside the server")
+    print(f"{'mode':<10} {'offered':>8} {'sent/s':>7} {'ok':>5} {'ok/s':>5} {'429':>5} {'503':>5}"
+          f" {'timeout':>8} {'error':>6}  {'client ok latency':<32} server ok latency")
+    spawn = multiprocessing.get_context("spawn")
+    for admission in (False, True):
+        ports = spawn.Queue()
+        proc = spawn.Process(target=_overload_server, args=(admission, capacity, work_seconds, ports),
+                             daemon=True)
+        proc.start()
+        base_url = f"http://127.0.0.1:{ports.get(timeout=60)}"
+        while True:
+            try:
+                httpx.get(f"{base_url}/samples", timeout=1.0)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+
+        for load in (0.5, 1.0, 2.0, 4.0):
+            results, sent_in = asyncio.run(_open_loop(base_url, max_rate * load, seconds, client_timeout=2.0))
+            time.sleep(2.5)  # let queued work drain before reading the server's timings
+            server_ok = [t for status, t in httpx.get(f"{base_url}/samples", timeout=10.0).json()
+                         if status == 200]
+            ok = [t for status, t in results if status == 200]
+            count = lambda s: sum(1 for status, _ in results if status == s)
+            print(f"{'admission' if admission else 'none':<10} {load:>7.1f}x {len(results) / sent_in:>7.0f}"
+                  f" {len(ok):>5} {len(ok) / seconds:>5.0f} {count(429):>5} {count(503):>5}"
+                  f" {count('timeout'):>8} {count('error'):>6}  {_percentiles(ok) if ok else '-':<32}"
+                  f" {_percentiles(server_ok) if server_ok else '-'}")
+        proc.terminate()
+        proc.join()
+
+
+# ------------------ WEATHER STORE ------------------ #
+
+def bench_weather(requests: int):
+    """Per-request cost of generating weather on demand vs reading the pre-computed store"""
+    from weather_store import WeatherStore
+
+    weather = Weather()
+    cities = [city.title() for city in weather.city_base_temps]
+    store = WeatherStore(weather, cities)
+    store.refresh()
+    print(f"store refresh for {len(cities)} cities: {store.refresh_duration * 1e3:.2f} ms")
+
+    cases = {
+        "current": (lambda c: json.dumps(weather.get_current_weather(c)),
+                    lambda c: store.payload("current", c)),
+        "forecast 5d": (lambda c: json.dumps(weather.get_forecast(c, 5)),
+                        lambda c: store.payload("forecast", c, 5)),
+        "alerts": (lambda c: json.dumps(weather.get_weather_alerts(c)),
+                   lambda c: store.payload("alerts", c)),
+    }
+    for label, (on_demand, stored) in cases.items():
+        row = []
+        for fn in (on_demand, stored):
+            started = time.perf_counter()
+            for i in range(requests):
+                fn(cities[i % len(cities)])
+            row.append((time.perf_counter() - started) / requests * 1e6)
+        print(f"{label:<12} on demand {row[0]:8.2f} us   store {row[1]:6.2f} us")
+
+
+# ------------------ SEARCH RESULT CACHE ------------------ #
+
+def bench_search_cache(catalog: int, queries: int, book_every: int):
+    """Search latency and hit rate for a skewed query mix with bookings mixed in"""
+    tmp = tempfile.TemporaryDirectory()
+    catalog_path = os.path.join(tmp.name, "catalog.bin")
+    write_catalog(catalog_path, synthetic_hotels(catalog))
+    rng = random.Random(5)
+    dates = [(f"2025-03-{d:02d}", f"2025-03-{d + 2:02d}") for d in range(1, 28)]
+    # Popular city/date pairs dominate: Zipf-like weights over all combinations
+    combos = [(city, *dates_) for city in _CITIES for dates_ in dates]
+    weights = [1 / (rank + 1) for rank in range(len(combos))]
+    mix = rng.choices(combos, weights, k=queries)
+
+    for cache_size in (0, 1024):
+        hotel = Hotel(search_cache_size=cache_size, catalog_path=catalog_path)
+        booked = 0
+        started = time.perf_counter()
+        for i, (city, check_in, check_out) in enumerate(mix):
+            result = hotel.search_hotels(city, check_in, check_out, 1)
+            if book_every and i % book_every == 0 and result["hotels"]:
+                hotel.book_hotel(result["hotels"][0]["id"], check_in, check_out, 1, "Bench", "b@example.com")
+                booked += 1
+        per_query = (time.perf_counter() - started) / queries * 1e3
+        print(f"cache {cache_size:>5}: {per_query:.3f} ms/query  {booked} bookings  {hotel.search_cache.metrics()}")
+    tmp.cleanup()
+
+
+# ------------------ GEOSPATIAL SEARCH ------------------ #
+
+def bench_geo(count: int, queries: int):
+    """Geo index build time, radius and nearest-k latency, and full searches around a point"""
+    hotels = synthetic_hotels(count)
+    started = time.perf_counter()
+    index = GeoIndex(hotels)
+    print(f"built geo index over {count} hotels in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(13)
+    points = []
+    for _ in range(queries):
+        lat, lon = _CITY_CENTERS[rng.choice(_CITIES)]
+        points.append((lat + rng.gauss(0, 0.1), lon + rng.gauss(0, 0.1)))
+
+    cases = {
+        "radius 2 km": lambda p: list(index.nearest(*p, max_km=2)),
+        "radius 10 km": lambda p: list(index.nearest(*p, max_km=10)),
+        "nearest 10": lambda p: list(islice(index.nearest(*p), 10)),
+    }
+    for label, fn in cases.items():
+        timings, found = [], 0
+        for point in points:
+            started = time.perf_counter()
+            found += len(fn(point))
+            timings.append(time.perf_counter() - started)
+        print(f"{label:<14} {_percentiles(timings)}  avg {found / len(points):.0f} hotels")
+
+    # What answering "within 2 km" costs without an index
+    sample = points[:5]
+    started = time.perf_counter()
+    for lat, lon in sample:
+        [h for h in hotels if haversine_km(lat, lon, h["latitude"], h["longitude"]) <= 2]
+    print(f"{'full scan 2 km':<14} {(time.perf_counter() - started) / len(sample) * 1e3:.1f} ms/query")
+
+    # Whole search_hotels calls, room and date filters included, cache off
+    tmp = tempfile.TemporaryDirectory()
+    catalog_path = os.path.join(tmp.name, "catalog.bin")
+    write_catalog(catalog_path, hotels)
+    del hotels, index
+    hotel = Hotel(search_cache_size=0, catalog_path=catalog_path)
+    searches = {
+        "city name": lambda p: hotel.search_hotels("Denver", "2025-03-01", "2025-03-03", 2),
+        "radius 2 km": lambda p: hotel.search_hotels(None, "2025-03-01", "2025-03-03", 2,
+                                                     latitude=p[0], longitude=p[1], radius_km=2),
+        "nearest 10": lambda p: hotel.search_hotels(None, "2025-03-01", "2025-03-03", 2,
+                                                    latitude=p[0], longitude=p[1], nearest=10),
+    }
+    for label, fn in searches.items():
+        fn(points[0])  # builds the geo index on first use
+        timings = []
+        for point in points[:min(len(points), 100)]:
+            started = time.perf_counter()
+            fn(point)
+            timings.append(time.perf_counter() - started)
+        print(f"search_hotels {label:<12} {_percentiles(timings)}")
+    tmp.cleanup()
+
+
+# ------------------ CATALOG LOADING ------------------ #
+
+def _rss_mb() -> float:
+    """Peak resident set size of this process, in MiB"""
+    # ru_maxrss survives exec on Linux and would report the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_json_catalog(json_path: str, results):
+    """Startup the old way: every hotel as a dict in memory, plus an ID map"""
+    results.put(("(imports only)", 0.0, _rss_mb(), None))
+    started = time.perf_counter()
+    with open(json_path) as f:
+        hotels = json.load(f)["hotels"]
+    by_id = {h["id"]: h for h in hotels}
+    results.put(("json + dicts", time.perf_counter() - started, _rss_mb(), len(by_id)))
+
+
+def _load_mapped_catalog(catalog_path: str, reload_path: str, db_path: str, results):
+    """Startup from the mapped catalog, time until its background index build is ready, then a reload"""
+    results.put(("(imports only)", 0.0, _rss_mb(), None))
+    started = time.perf_counter()
+    hotel = Hotel(db_path=db_path, catalog_path=catalog_path)
+    results.put(("mmap catalog", time.perf_counter() - started, _rss_mb(), len(hotel.hotels)))
+
+    # As the API does: serve right away and build the indexes behind
+    build = hotel.build_indexes()
+    search_started = time.perf_counter()
+    hotel.search_hotels("Denver", "2025-03-01", "2025-03-03", 1)
+    results.put(("  city search (build)", time.perf_counter() - search_started, _rss_mb(), None))
+    for name in ("name", "geo"):
+        while not hotel.index_ready(name):
+            time.sleep(0.05)
+        results.put((f"  {name} index ready", time.perf_counter() - started, _rss_mb(), None))
+    build.join()
+    lookup_started = time.perf_counter()
+    hotel.lookup_hotels("Grand Plaza Hotel Denver")
+    results.put(("  first lookup", time.perf_counter() - lookup_started, _rss_mb(), None))
+
+    # Reload a catalog with a new digest, so every room row is seeded again,
+    # while another process keeps booking against the shared inventory
+    spawn = multiprocessing.get_context("spawn")
+    stop, waits = spawn.Event(), spawn.Queue()
+    booker = spawn.Process(target=_book_until, args=(db_path, hotel.hotels[0]["id"], stop, waits))
+    booker.start()
+    time.sleep(1.0)
+    reload_started = time.perf_counter()
+    hotel.load_catalog(reload_path)
+    results.put(("  hot reload", time.perf_counter() - reload_started, _rss_mb(), None))
+    stop.set()
+    slowest = waits.get()
+    booker.join()
+    results.put(("  slowest booking", slowest, _rss_mb(), None))
+
+
+def _book_until(db_path: str, hotel_id: str, stop, waits):
+    """Book one room at a time until stopped, then report the longest wait"""
+    inventory = Inventory(db_path)
+    slowest = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        inventory.reserve(hotel_id, 1, os.urandom(4).hex().upper(), {"hotel_id": hotel_id})
+        slowest = max(slowest, time.perf_counter() - started)
+        time.sleep(0.01)
+    waits.put(slowest)
+
+
+def bench_catalog(count: int):
+    """Startup time, peak RSS and index readiness: JSON into dicts vs the memory-mapped catalog"""
+    hotels = synthetic_hotels(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "catalog.json")
+        catalog_path = os.path.join(tmp, "catalog.bin")
+        reload_path = os.path.join(tmp, "catalog-reload.bin")
+        db_path = os.path.join(tmp, "inventory.db")
+        with open(json_path, "w") as f:
+            json.dump({"hotels": hotels}, f)
+        started = time.perf_counter()
+        write_catalog(catalog_path, hotels)
+        print(f"wrote {count} hotels in {time.perf_counter() - started:.1f}s: "
+              f"json {os.path.getsize(json_path) / 2**20:.0f} MiB, catalog {os.path.getsize(catalog_path) / 2**20:.0f} MiB")
+        # Same hotels with one price changed: a new digest to reload
+        hotels[0] = {**hotels[0], "price_per_night": hotels[0]["price_per_night"] + 1}
+        write_catalog(reload_path, hotels)
+        del hotels
+
+        # Fresh interpreters, so peak RSS is each loader's own
+        spawn = multiprocessing.get_context("spawn")
+        runs = [
+            ("", _load_json_catalog, (json_path,)),
+            ("inventory seeded on load", _load_mapped_catalog, (catalog_path, reload_path, db_path)),
+            ("inventory already seeded (worker restart)", _load_mapped_catalog, (catalog_path, reload_path, db_path)),
+        ]
+        print(f"{'':<24} {'seconds':>8} {'peak RSS MiB':>13}")
+        for note, target, args in runs:
+            if note:
+                print(f"-- {note}")
+            results = spawn.Queue()
+            proc = spawn.Process(target=target, args=(*args, results))
+            proc.start()
+            proc.join()
+            while not results.empty():
+                label, seconds, rss, _ = results.get()
+                print(f"{label:<24} {seconds:>8.2f} {rss:>13.0f}")
+
+
+# ------------------ CHAT HISTORY ------------------ #
+
+def _unbounded_chat_app():
+    """The client's original history: every message drawn on every rerun"""
+    import streamlit as st
+
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+def _bounded_chat_app():
+    import streamlit as st
+    from chat_history import render
+
+    render(st.session_state.history)
+
+
+def _chat_session(catalog_path: str, turns: int, seed: int = 11):
+    """A long session: searches, nearest-hotel lookups and weather, with Show Tools pressed now and then"""
+    import mcp_server_fastmcp as server  # needs fastmcp installed
+
+    hotel, weather = Hotel(catalog_path=catalog_path), Weather()
+    rng = random.Random(seed)
+    tools = [(name, tool.description) for name, tool in asyncio.run(server.mcp.get_tools()).items()]
+    for turn in range(turns):
+        city = rng.choice(_CITIES)
+        kind = rng.random()
+        if kind < 0.4:
+            day = rng.randint(1, 20)
+            result = server._fmt_hotels(hotel.search_hotels(city, f"2025-03-{day:02d}", f"2025-03-{day + 2:02d}", 1))
+            yield "user", f"Find hotels in {city} from March {day} for 2 nights"
+        elif kind < 0.6:
+            result = server._fmt_hotels(hotel.search_hotels(city, "2025-03-01", "2025-03-03", 1, nearest=6))
+            yield "user", f"Closest hotels to downtown {city}"
+        elif kind < 0.9:
+            days = rng.randint(3, 7)
+            result = server._format_weather_forecast(weather.get_forecast(city, days), days)
+            yield "user", f"{days}-day forecast for {city}"
+        else:
+            result = server._format_current_weather(weather.get_current_weather(city))
+            yield "user", f"Weather in {city}?"
+        yield "assistant", result
+        if turn % 10 == 9:
+            for name, description in tools:
+                yield "system", (name, description)
+
+
+def bench_chat_history(catalog: int, turns: int, reruns: int):
+    """Streamlit rerun time and stored history as a session grows, unbounded list vs ChatHistory"""
+    from streamlit.testing.v1 import AppTest  # needs streamlit installed
+    from chat_history import ChatHistory
+
+    # Setting session state outside a script run warns on every checkpoint; a
+    # filter, since streamlit resets its loggers' levels when it loads config
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: "missing ScriptRunContext" not in record.getMessage())
+    tmp = tempfile.TemporaryDirectory()
+    catalog_path = os.path.join(tmp.name, "catalog.bin")
+    write_catalog(catalog_path, synthetic_hotels(catalog))
+    checkpoints = sorted({c for c in (10, 50, 100, 250, 500, 1000) if c < turns} | {turns})
+    messages, history = [], ChatHistory()
+    session = _chat_session(catalog_path, turns)
+    done = 0
+    print(f"{'turns':>6} {'messages':>9} | {'unbounded ms':>13} {'drawn KiB':>10} {'stored KiB':>11}"
+          f" | {'bounded ms':>11} {'drawn KiB':>10} {'stored KiB':>11}")
+    for checkpoint in checkpoints:
+        for role, content in session:
+            if role == "system":
+                # The old Show Tools button appended every tool again on each press
+                messages.append({"role": "system", "content": f"{content[0]}: {content[1]}"})
+                history.set_system(*content)
+                continue
+            messages.append({"role": role, "content": content})
+            history.add(role, content)
+            if role == "assistant":
+                done += 1
+                if done == checkpoint:
+                    break
+
+        row = []
+        for app, key, state in ((_unbounded_chat_app, "messages", messages),
+                                (_bounded_chat_app, "history", history)):
+            at = AppTest.from_function(app, default_timeout=120)
+            at.session_state[key] = state
+            at.run()  # first run compiles the script
+            samples = []
+            for _ in range(reruns):
+                started = time.perf_counter()
+                at.run()
+                samples.append(time.perf_counter() - started)
+            drawn = sum(len(element.value) for element in at.markdown)
+            row.append((statistics.median(samples) * 1e3, drawn / 1024))
+        stored_old = sum(len(m["content"]) for m in messages)
+        stored_new = history.stats()["stored_chars"]
+        print(f"{checkpoint:>6} {len(messages):>9} | {row[0][0]:>13.1f} {row[0][1]:>10.0f} {stored_old / 1024:>11.0f}"
+              f" | {row[1][0]:>11.1f} {row[1][1]:>10.0f} {stored_new / 1024:>11.0f}")
+    print(f"bounded history: {history.stats()}")
+    tmp.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    workers = sub.add_parser("workers", help="shared inventory throughput from 1..N processes")
+    workers.add_argument("--max-workers", type=int, default=os.cpu_count() or 4)
+    workers.add_argument("--seconds", type=float, default=2.0)
+
+    sub.add_parser("tool-output", help="MCP tool result size in json vs markdown mode")
+
+    lookup = sub.add_parser("lookup", help="hotel name index latency")
+    lookup.add_argument("--hotels", type=int, default=1_000_000)
+    lookup.add_argument("--queries", type=int, default=1000)
+
+    resilience = sub.add_parser("resilience", help="hedging, retries and circuit breaking against a faulty stub API")
+    resilience.add_argument("--requests", type=int, default=1000)
+    resilience.add_argument("--concurrency", type=int, default=20)
+
+    coalescing = sub.add_parser("coalescing", help="backend calls saved by single-flight during bursts")
+    coalescing.add_argument("--bursts", type=int, default=20)
+    coalescing.add_argument("--burst-size", type=int, default=40)
+
+    overload = sub.add_parser("overload", help="latency of admitted requests as offered load passes capacity")
+    overload.add_argument("--capacity", type=int, default=4)
+    overload.add_argument("--work-ms", type=float, default=200.0)
+    overload.add_argument("--seconds", type=float, default=3.0)
+
+    weather = sub.add_parser("weather", help="on-demand weather generation vs the pre-computed store")
+    weather.add_argument("--requests", type=int, default=20000)
+
+    search_cache = sub.add_parser("search-cache", help="hotel search cache hit rate and latency")
+    search_cache.add_argument("--hotels", type=int, default=20_000)
+    search_cache.add_argument("--queries", type=int, default=3000)
+    search_cache.add_argument("--book-every", type=int, default=20)
+
+    geo = sub.add_parser("geo", help="radius and nearest-hotel search latency")
+    geo.add_argument("--hotels", type=int, default=1_000_000)
+    geo.add_argument("--queries", type=int, default=1000)
+
+    catalog = sub.add_parser("catalog", help="catalog startup time, memory and index readiness, JSON vs memory-mapped")
+    catalog.add_argument("--hotels", type=int, default=1_000_000)
+
+    chat = sub.add_parser("chat-history", help="Streamlit rerun time as a chat session grows")
+    chat.add_argument("--hotels", type=int, default=500)
+    chat.add_argument("--turns", type=int, default=500)
+    chat.add_argument("--reruns", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.bench == "workers":
+        bench_workers(args.max_workers, args.seconds)
+    elif args.bench == "tool-output":
+        bench_tool_output()
+    elif args.bench == "lookup":
+        bench_lookup(args.hotels, args.queries)
+    elif args.bench == "resilience":
+        bench_resilience(args.requests, args.concurrency)
+    elif args.bench == "coalescing":
+        bench_coalescing(args.bursts, args.burst_size)
+    elif args.bench == "overload":
+        bench_overload(args.capacity, args.work_ms, args.seconds)
+    elif args.bench == "weather":
+        bench_weather(args.requests)
+    elif args.bench == "search-cache":
+        bench_search_cache(args.hotels, args.queries, args.book_every)
+    elif args.bench == "geo":
+        bench_geo(args.hotels, args.queries)
+    elif args.bench == "catalog":
+        bench_catalog(args.hotels)
+    elif args.bench == "chat-history":
+        bench_chat_history(args.hotels, args.turns, args.reruns)
+
+
+if __name__ == "__main__":
+    main()
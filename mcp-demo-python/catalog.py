@@ -0,0 +1,361 @@
+"""
+Hotel Catalog Files
+Compact fixed-width binary catalog read through mmap: records are decoded
+into hotel dicts only when asked for, so opening a catalog of millions of
+hotels costs almost no time or memory
+
+Build one from JSON with:
+    python catalog.py build sample_catalog.json hotel_catalog.bin
+"""
+
+import hashlib
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+SAMPLE_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_catalog.json")
+
+MAGIC = b"HCAT"
+FORMAT_VERSION = 1
+# magic, format version, hotel count, then offsets of the record table,
+# the ID order table, the string heap and the JSON metadata, and its length
+_HEADER = struct.Struct("<4sII4xQQQQQ")
+# id offset/length, name offset/length, location number, amenity bitmask,
+# price per night, rating, starting rooms, latitude, longitude (NaN if unknown)
+_RECORD = struct.Struct("<IHIHHQddIdd")
+_ID = struct.Struct("<IH")
+_ROOMS = struct.Struct("<I")
+_ROOMS_OFFSET = struct.calcsize("<IHIHHQdd")
+_MAX_AMENITIES = 64
+
+_generations = itertools.count(1)
+
+
+def write_catalog(path: str, hotels: Iterable[Dict], climates: Optional[Dict[str, Dict]] = None) -> str:
+    """
+    Write hotels to a catalog file, replacing any existing one atomically
+
+    Records are grouped by location so a city search reads one contiguous
+    range, and an ID order table allows lookups by binary search.
+
+    Args:
+        path: Destination file; a running server watching it reloads on replace
+        hotels: Entries shaped like the sample catalog's hotels
+        climates: Weather base temperatures by lower-case city name
+
+    Returns:
+        Digest of the catalog contents
+
+    Raises:
+        ValueError: duplicate hotel IDs or more than 64 distinct amenities
+    """
+    data, digest = _encode(list(hotels), climates or {})
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return digest
+
+
+def _encode(hotels: List[Dict], climates: Dict[str, Dict]) -> Tuple[bytes, str]:
+    by_id = sorted(hotels, key=lambda h: h["id"])
+    for previous, hotel in zip(by_id, by_id[1:]):
+        if previous["id"] == hotel["id"]:
+            raise ValueError(f"Duplicate hotel ID {hotel['id']}: {previous['name']!r} and {hotel['name']!r}")
+
+    hotels = sorted(hotels, key=lambda h: (h["location"].casefold(), h["id"]))
+    amenities = list(dict.fromkeys(a for h in hotels for a in h.get("amenities", [])))
+    if len(amenities) > _MAX_AMENITIES:
+        raise ValueError(f"At most {_MAX_AMENITIES} distinct amenities are supported, got {len(amenities)}")
+    amenity_bits = {a: 1 << i for i, a in enumerate(amenities)}
+
+    locations: List[Dict] = []
+    strings = bytearray()
+    records = bytearray(_RECORD.size * len(hotels))
+    position_of = {}
+    for position, hotel in enumerate(hotels):
+        position_of[hotel["id"]] = position
+        if not locations or locations[-1]["name"].casefold() != hotel["location"].casefold():
+            locations.append({"name": hotel["location"], "start": position, "count": 0,
+                              "lat_sum": 0.0, "lon_sum": 0.0, "located": 0})
+        location = locations[-1]
+        location["count"] += 1
+        lat, lon = hotel.get("latitude"), hotel.get("longitude")
+        if lat is not None and lon is not None:
+            location["lat_sum"] += lat
+            location["lon_sum"] += lon
+            location["located"] += 1
+
+        hotel_id, name = hotel["id"].encode(), hotel["name"].encode()
+        id_offset = len(strings)
+        strings += hotel_id
+        name_offset = len(strings)
+        strings += name
+        mask = 0
+        for amenity in hotel.get("amenities", []):
+            mask |= amenity_bits[amenity]
+        _RECORD.pack_into(
+            records, position * _RECORD.size,
+            id_offset, len(hotel_id), name_offset, len(name), len(locations) - 1, mask,
+            hotel["price_per_night"], hotel["rating"], hotel["available_rooms"],
+            math.nan if lat is None else lat, math.nan if lon is None else lon,
+        )
+
+    # Mean hotel position per city: the center of "near <city>" searches
+    for location in locations:
+        located = location.pop("located")
+        lat_sum, lon_sum = location.pop("lat_sum"), location.pop("lon_sum")
+        location["latitude"] = lat_sum / located if located else None
+        location["longitude"] = lon_sum / located if located else None
+
+    id_order = array("I", (position_of[h["id"]] for h in by_id))
+    if sys.byteorder != "little":
+        id_order.byteswap()
+    id_order = id_order.tobytes()
+
+    digest = hashlib.blake2b(records, digest_size=16)
+    digest.update(strings)
+    digest = digest.hexdigest()
+    meta = json.dumps({
+        "digest": digest,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "locations": locations,
+        "amenities": amenities,
+        "climates": climates,
+    }).encode()
+
+    records_offset = _HEADER.size
+    ids_offset = records_offset + len(records)
+    strings_offset = ids_offset + len(id_order)
+    meta_offset = strings_offset + len(strings)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(hotels),
+                          records_offset, ids_offset, strings_offset, meta_offset, len(meta))
+    return b"".join((header, bytes(records), id_order, bytes(strings), meta)), digest
+
+
+class Catalog:
+    def __init__(self, path: Optional[str] = None, data: Optional[bytes] = None):
+        """
+        Open a catalog file (memory-mapped) or an encoded catalog in memory
+
+        Args:
+            path: Catalog file written by write_catalog
+            data: Encoded catalog, used instead of a file
+
+        Raises:
+            ValueError: not a catalog file, or an unsupported format version
+        """
+        self.path = path
+        if path is not None:
+            with open(path, "rb") as f:
+                # The mapping stays valid after the file is replaced or closed
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = data
+        magic, version, count, self._records, ids_offset, self._strings, meta_offset, meta_length = \
+            _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path or 'data'} is not a hotel catalog")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog format version {version}")
+        self._count = count
+
+        meta = json.loads(bytes(self._buffer[meta_offset:meta_offset + meta_length]))
+        self.digest: str = meta["digest"]
+        self.created_at: str = meta["created_at"]
+        self.locations: List[Dict] = meta["locations"]
+        self.climates: Dict[str, Dict] = meta["climates"]
+        self._amenities: List[str] = meta["amenities"]
+        self._amenity_lists: Dict[int, Tuple[str, ...]] = {}
+
+        ids = memoryview(self._buffer)[ids_offset:ids_offset + 4 * count]
+        if sys.byteorder == "little":
+            self._id_order = ids.cast("I")
+        else:
+            self._id_order = array("I", bytes(ids))
+            self._id_order.byteswap()
+
+        self.generation = next(_generations)
+        self.loaded_at = time.time()
+        self._indexes: Dict[str, object] = {}
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def from_hotels(cls, hotels: Iterable[Dict], climates: Optional[Dict[str, Dict]] = None) -> "Catalog":
+        """Catalog held in memory, for small catalogs that don't warrant a file"""
+        return cls(data=_encode(list(hotels), climates or {})[0])
+
+    @classmethod
+    def from_json(cls, path: str = SAMPLE_CATALOG) -> "Catalog":
+        """In-memory catalog from a JSON file with "hotels" and "climates" """
+        with open(path) as f:
+            source = json.load(f)
+        return cls.from_hotels(source["hotels"], source.get("climates"))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> Dict:
+        if not 0 <= position < self._count:
+            raise IndexError("catalog position out of range")
+        return self._hotel(position)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for position in range(self._count):
+            yield self._hotel(position)
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._strings + offset
+        return str(self._buffer[start:start + length], "utf-8")
+
+    def _hotel(self, position: int) -> Dict:
+        (id_offset, id_length, name_offset, name_length, location, mask,
+         price, rating, rooms, lat, lon) = _RECORD.unpack_from(self._buffer, self._records + position * _RECORD.size)
+        amenities = self._amenity_lists.get(mask)
+        if amenities is None:
+            amenities = tuple(a for i, a in enumerate(self._amenities) if mask >> i & 1)
+            self._amenity_lists[mask] = amenities
+        hotel = {
+            "id": self._text(id_offset, id_length),
+            "name": self._text(name_offset, name_length),
+            "location": self.locations[location]["name"],
+            "price_per_night": price,
+            "rating": rating,
+            "amenities": list(amenities),
+            "available_rooms": rooms,
+        }
+        if not math.isnan(lat):
+            hotel["latitude"] = lat
+            hotel["longitude"] = lon
+        return hotel
+
+    def _id_at(self, position: int) -> str:
+        id_offset, id_length = _ID.unpack_from(self._buffer, self._records + position * _RECORD.size)
+        return self._text(id_offset, id_length)
+
+    def get(self, hotel_id: str) -> Optional[Dict]:
+        """Hotel by ID, found by binary search over the ID order table"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._id_at(self._id_order[middle]) < hotel_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            position = self._id_order[low]
+            if self._id_at(position) == hotel_id:
+                return self._hotel(position)
+        return None
+
+    def in_locations(self, query: str) -> Iterator[Dict]:
+        """Hotels whose location contains query (case insensitive)"""
+        query = query.lower()
+        for location in self.locations:
+            if query in location["name"].lower():
+                for position in range(location["start"], location["start"] + location["count"]):
+                    yield self._hotel(position)
+
+    def room_counts(self) -> Iterator[Tuple[str, int]]:
+        """(hotel ID, starting rooms) for every hotel, without decoding whole records"""
+        for position in range(self._count):
+            offset = self._records + position * _RECORD.size
+            id_offset, id_length = _ID.unpack_from(self._buffer, offset)
+            rooms, = _ROOMS.unpack_from(self._buffer, offset + _ROOMS_OFFSET)
+            yield self._text(id_offset, id_length), rooms
+
+    def index(self, name: str, build: Callable[["Catalog"], object]):
+        """
+        Index over this catalog, built on first use
+
+        Concurrent first callers wait for a single build. Indexes belong to
+        the catalog, so a reloaded catalog starts with fresh ones.
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            with self._index_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = build(self)
+                    self._indexes[name] = index
+        return index
+
+    def has_index(self, name: str) -> bool:
+        """Whether the named index is built, without building it"""
+        return name in self._indexes
+
+
+def sample_climates() -> Dict[str, Dict]:
+    """Weather base temperatures bundled with the sample catalog"""
+    with open(SAMPLE_CATALOG) as f:
+        return json.load(f)["climates"]
+
+
+class CatalogWatcher:
+    def __init__(self, path: str, on_change: Callable[[str], None], interval: float = 5.0):
+        """
+        Args:
+            path: Catalog file to watch; replace it (write_catalog does) to publish a new one
+            on_change: Called with the path from the watcher thread when the file changes
+            interval: Seconds between checks
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def check(self) -> bool:
+        """Reload if the file changed since the last successful load"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self.on_change(self.path)
+        self._signature = signature
+        return True
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the current catalog; the next check retries
+                print(f"Catalog reload failed: {e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python catalog.py build SOURCE.json CATALOG.bin")
+    with open(sys.argv[2]) as f:
+        source = json.load(f)
+    digest = write_catalog(sys.argv[3], source["hotels"], source.get("climates"))
+    print(f"Wrote {len(source['hotels'])} hotels to {sys.argv[3]} ({digest})")
@@ -0,0 +1,136 @@
+"""
+Chat History
+Bounded conversation history for the Streamlit client: only the latest
+messages are rendered on each rerun, system entries are kept once, and
+large tool outputs are stored once and rendered only when expanded
+"""
+
+import hashlib
+import itertools
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+# Outputs longer than this are stored once and shown as a preview
+INLINE_CHARS = 1000
+PREVIEW_CHARS = 300
+
+
+class Entry:
+    __slots__ = ("id", "role", "content", "blob")
+
+    def __init__(self, entry_id: int, role: str, content: str, blob: Optional[str] = None):
+        self.id = entry_id
+        self.role = role
+        self.content = content  # full text, or a preview when blob is set
+        self.blob = blob
+
+
+class ChatHistory:
+    def __init__(self, max_entries: int = 400, inline_chars: int = INLINE_CHARS):
+        """
+        Args:
+            max_entries: Messages kept; older ones are dropped and only counted
+            inline_chars: Longer messages go to the blob store and show a preview
+        """
+        self.max_entries = max_entries
+        self.inline_chars = inline_chars
+        self.entries: Deque[Entry] = deque()
+        self.system: Dict[str, str] = {}
+        self.dropped = 0
+        self._blobs: Dict[str, List] = {}  # digest -> [text, reference count]
+        self._ids = itertools.count()
+
+    def add(self, role: str, content: str) -> Entry:
+        """Append a message, dropping the oldest once the history is full"""
+        blob = None
+        if len(content) > self.inline_chars:
+            blob = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+            stored = self._blobs.setdefault(blob, [content, 0])
+            stored[1] += 1
+            content = _preview(content)
+        entry = Entry(next(self._ids), role, content, blob)
+        self.entries.append(entry)
+        while len(self.entries) > self.max_entries:
+            self._release(self.entries.popleft())
+            self.dropped += 1
+        return entry
+
+    def set_system(self, key: str, content: str):
+        """Record a system entry once per key; repeating it replaces, never appends"""
+        self.system[key] = content
+
+    def _release(self, entry: Entry):
+        if entry.blob is not None:
+            stored = self._blobs[entry.blob]
+            stored[1] -= 1
+            if not stored[1]:
+                del self._blobs[entry.blob]
+
+    def text(self, entry: Entry) -> str:
+        """Full message text"""
+        return self._blobs[entry.blob][0] if entry.blob is not None else entry.content
+
+    def window(self, size: int) -> Tuple[int, List[Entry]]:
+        """
+        The latest messages
+
+        Returns:
+            (number of older messages kept but not in the window, latest size messages)
+        """
+        size = min(size, len(self.entries))
+        hidden = len(self.entries) - size
+        return hidden, list(itertools.islice(self.entries, hidden, None))
+
+    def clear(self):
+        self.entries.clear()
+        self.system.clear()
+        self._blobs.clear()
+        self.dropped = 0
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "dropped": self.dropped,
+            "system": len(self.system),
+            "blobs": len(self._blobs),
+            "stored_chars": sum(len(e.content) for e in self.entries)
+                            + sum(len(text) for text, _ in self._blobs.values())
+                            + sum(len(text) for text in self.system.values()),
+        }
+
+
+def _preview(content: str) -> str:
+    """Leading lines of a long output, cut at a line break where possible"""
+    head = content[:PREVIEW_CHARS]
+    cut = head.rfind("\n")
+    return (head[:cut] if cut > 0 else head).rstrip() + "\n\n…"
+
+
+def render(history: ChatHistory, page: int = 20):
+    """
+    Draw the latest page of messages
+
+    Older messages sit behind a "show earlier" button and large outputs
+    behind a toggle, so a rerun costs the same however long the session is.
+    """
+    shown = st.session_state.setdefault("history_shown", page)
+    hidden, entries = history.window(shown)
+
+    if history.system:
+        with st.expander(f"🔧 System ({len(history.system)} entries)"):
+            for key, content in history.system.items():
+                st.markdown(f"- **{key}**: {content}")
+
+    if history.dropped:
+        st.caption(f"{history.dropped} older messages were removed to keep the session fast")
+    if hidden and st.button(f"⬆️ Show earlier messages ({hidden} hidden)"):
+        st.session_state.history_shown = shown + page
+        st.rerun()
+
+    for entry in entries:
+        with st.chat_message(entry.role):
+            st.markdown(entry.content)
+            if entry.blob is not None and st.toggle("Show full output", key=f"history-{entry.id}"):
+                st.markdown(history.text(entry))
@@ -0,0 +1,185 @@
+"""
+Hotel Geo Index
+Grid of latitude/longitude cells over the catalog answering radius and
+nearest-hotel queries by visiting only the cells around the search point
+"""
+
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# ~1.1 km tall cells: a downtown cell holds tens of hotels, and a radius
+# search of a few km touches a few dozen cells
+DEFAULT_CELL_DEGREES = 0.01
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    def __init__(self, hotels: List[Dict], cell_degrees: float = DEFAULT_CELL_DEGREES):
+        """
+        Args:
+            hotels: Catalog entries; ones without latitude/longitude are not indexed
+            cell_degrees: Grid cell size in degrees of latitude and longitude,
+                rounded so whole cells cover the globe
+        """
+        self._rows = max(1, round(180 / cell_degrees))
+        self._cols = max(1, round(360 / cell_degrees))
+        self._lat_step = 180 / self._rows
+        self._lon_step = 360 / self._cols
+        self._ids: List[str] = []
+        # Coordinates in radians, with cos(latitude) precomputed for haversine
+        self._lat = array("d")
+        self._lon = array("d")
+        self._cos_lat = array("d")
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+        for hotel in hotels:
+            lat, lon = hotel.get("latitude"), hotel.get("longitude")
+            if lat is None or lon is None:
+                continue
+            position = len(self._ids)
+            self._ids.append(hotel["id"])
+            self._lat.append(math.radians(lat))
+            self._lon.append(math.radians(lon))
+            self._cos_lat.append(math.cos(math.radians(lat)))
+            self._cells[self._cell(lat, lon)].append(position)
+        self._cells = dict(self._cells)
+        self._cell_keys = list(self._cells)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = min(self._rows - 1, int((lat + 90) / self._lat_step))
+        col = int(((lon + 180) % 360) / self._lon_step) % self._cols
+        return row, col
+
+    def _ring(self, row: int, col: int, r: int) -> Iterator[Tuple[int, int]]:
+        """Cells exactly r steps from (row, col), wrapping around in longitude"""
+        if r == 0:
+            yield row, col
+            return
+        if 2 * r + 1 > self._cols:
+            full_row = range(self._cols)  # every column is within r steps
+        else:
+            full_row = [(col + d_col) % self._cols for d_col in range(-r, r + 1)]
+        sides = [c for c in {(col - r) % self._cols, (col + r) % self._cols}
+                 if self._ring_distance(row, col, (row, c)) == r]
+        for d_row in range(-r, r + 1):
+            ring_row = row + d_row
+            if not 0 <= ring_row < self._rows:
+                continue
+            for ring_col in full_row if abs(d_row) == r else sides:
+                yield ring_row, ring_col
+
+    def _ring_distance(self, row: int, col: int, cell: Tuple[int, int]) -> int:
+        d_col = abs(cell[1] - col)
+        return max(abs(cell[0] - row), min(d_col, self._cols - d_col))
+
+    def _lower_bound_km(self, lat: float, r: int) -> float:
+        """No point in a cell r or more steps away can be closer than this"""
+        if r <= 1:
+            return 0.0
+        along_lat = (r - 1) * self._lat_step * KM_PER_DEGREE
+        # Points at least r - 1 cells of longitude apart, both within the
+        # band of rows reached so far, are at least this far apart
+        max_lat = min(90.0, abs(lat) + (r + 1) * self._lat_step)
+        d_lon = math.radians(min((r - 1) * self._lon_step, 180.0))
+        along_lon = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(math.radians(max_lat)) * math.sin(d_lon / 2)))
+        return min(along_lat, along_lon)
+
+    def _cell_bound_km(self, lat: float, lon: float, cos_phi: float, cell: Tuple[int, int]) -> float:
+        """No point in cell can be closer to (lat, lon) than this"""
+        south = cell[0] * self._lat_step - 90
+        north = south + self._lat_step
+        d_lat = max(0.0, south - lat, lat - north)
+        west = cell[1] * self._lon_step - 180
+        offset = (lon - west) % 360  # degrees east of the cell's west edge
+        d_lon = 0.0 if offset <= self._lon_step else min(offset - self._lon_step, 360 - offset)
+        # hav(d) >= hav(d_lat) + cos(lat) * min cos(cell lat) * hav(d_lon)
+        cos_cell = math.cos(math.radians(min(90.0, max(abs(south), abs(north)))))
+        a = (math.sin(math.radians(d_lat) / 2) ** 2
+             + cos_phi * cos_cell * math.sin(math.radians(d_lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+    def nearest(self, lat: float, lon: float, max_km: Optional[float] = None) -> Iterator[Tuple[str, float]]:
+        """
+        Hotels ordered by distance from a point, nearest first
+
+        Consumed lazily: callers applying their own filters take results
+        until they have enough, and only the cells needed are visited.
+
+        Args:
+            lat: Latitude of the search point
+            lon: Longitude of the search point
+            max_km: Stop at this distance; None searches the whole catalog
+
+        Returns:
+            Iterator of (hotel ID, distance in km)
+        """
+        phi, lam = math.radians(lat), math.radians(lon)
+        cos_phi = math.cos(phi)
+        row, col = self._cell(lat, lon)
+        heap: List[Tuple[float, int]] = []
+        remaining = len(self._ids)
+        swept = False
+        scanned = 0  # ring cells looked at so far
+        r = 0
+        while remaining or heap:
+            bound = math.inf if swept else self._lower_bound_km(lat, r)
+            # Everything closer than the unvisited cells can go out now
+            while heap and heap[0][0] <= bound:
+                distance, position = heapq.heappop(heap)
+                if position < 0:  # a queued cell: its hotels may be next
+                    self._push_cell(heap, phi, lam, cos_phi, self._cells[self._cell_keys[-1 - position]], max_km)
+                    continue
+                yield self._ids[position], distance
+            if max_km is not None and bound > max_km:
+                return
+            if not remaining:
+                swept = True  # every hotel is in the heap; drain it
+                continue
+            if scanned >= len(self._cells) or r > self._rows + self._cols // 2:
+                # Far from everything (open country, near a pole): rings now
+                # cost more than queueing every cell not yet visited, nearest
+                # first, and opening each only when it could hold the next result
+                for number, cell in enumerate(self._cell_keys):
+                    if self._ring_distance(row, col, cell) >= r:
+                        bound_km = self._cell_bound_km(lat, lon, cos_phi, cell)
+                        if max_km is None or bound_km <= max_km:
+                            heapq.heappush(heap, (bound_km, -1 - number))
+                remaining = 0
+                swept = True
+                continue
+            for cell in self._ring(row, col, r):
+                scanned += 1
+                positions = self._cells.get(cell)
+                if positions:
+                    remaining -= len(positions)
+                    self._push_cell(heap, phi, lam, cos_phi, positions, max_km)
+            r += 1
+
+    def _push_cell(self, heap: list, phi: float, lam: float, cos_phi: float,
+                   positions: List[int], max_km: Optional[float]):
+        """Queue a cell's hotels by distance, dropping those beyond max_km"""
+        lats, lons, cos_lats = self._lat, self._lon, self._cos_lat
+        sin, push = math.sin, heapq.heappush
+        # Compare haversine terms, so rejected hotels skip the sqrt and asin
+        limit = 1.0 if max_km is None else math.sin(min(math.pi, max_km / EARTH_RADIUS_KM) / 2) ** 2
+        for position in positions:
+            a = (sin((lats[position] - phi) / 2) ** 2
+                 + cos_phi * cos_lats[position] * sin((lons[position] - lam) / 2) ** 2)
+            if a <= limit:
+                push(heap, (2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a))), position))
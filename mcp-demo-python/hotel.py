@@ -4,88 +4,125 @@ Simulates a hotel booking system with search and booking capabilities
 """
 
 from datetime import datetime
-from typing import List, Dict, Optional
-import random
+from itertools import islice
+from typing import List, Dict, Optional, Tuple
+import threading
 import uuid
+import zlib
+from catalog import Catalog
+from inventory import Inventory
+from hotel_index import HotelNameIndex
+from geo_index import GeoIndex
+from search_cache import SearchCache
 
 class Hotel:
-    def __init__(self):
-        self.hotels = self._generate_dummy_hotels()
-        self.bookings = {}
-   
-    def _generate_dummy_hotels(self) -> List[Dict]:
-        """Generate dummy hotel data"""
-        hotels = [
-            {
-                "id": "hotel_001",
-                "name": "Grand Plaza Hotel",
-                "location": "New York",
-                "price_per_night": 299.99,
-                "rating": 4.5,
-                "amenities": ["WiFi", "Pool", "Gym", "Room Service"],
-                "available_rooms": 15
-            },
-            {
-                "id": "hotel_002", 
-                "name": "Sunset Beach Resort",
-                "location": "Miami",
-                "price_per_night": 199.99,
-                "rating": 4.2,
-                "amenities": ["Beach Access", "WiFi", "Pool", "Spa"],
-                "available_rooms": 8
-            },
-            {
-                "id": "hotel_003",
-                "name": "Mountain View Lodge",
-                "location": "Denver",
-                "price_per_night": 149.99,
-                "rating": 4.0,
-                "amenities": ["WiFi", "Fireplace", "Hiking Trails"],
-                "available_rooms": 12
-            },
-            {
-                "id": "hotel_004",
-                "name": "City Center Inn",
-                "location": "Chicago",
-                "price_per_night": 179.99,
-                "rating": 3.8,
-                "amenities": ["WiFi", "Business Center", "Parking"],
-                "available_rooms": 20
-            },
-            {
-                "id": "hotel_005",
-                "name": "Luxury Suites",
-                "location": "Los Angeles",
-                "price_per_night": 399.99,
-                "rating": 4.8,
-                "amenities": ["WiFi", "Pool", "Spa", "Concierge", "Valet"],
-                "available_rooms": 5
-            },
-             {
-                "id": "hotel_005",
-                "name": "Marriot Hotel",
-                "location": "New York",
-                "price_per_night": 399.99,
-                "rating": 4.7,
-                "amenities": ["WiFi", "Gym", "Room Service"],
-                "available_rooms": 15
-            }
-        ]
-        return hotels
+    def __init__(self, db_path: Optional[str] = None, search_cache_size: int = 1024,
+                 catalog_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite file holding room availability and bookings.
+                Point every API worker at the same file to share state.
+            search_cache_size: Search results kept in this process's cache
+            catalog_path: Catalog file written by catalog.write_catalog; the
+                bundled sample catalog is used when omitted
+        """
+        self.inventory = Inventory(db_path)
+        self.search_cache = SearchCache(search_cache_size)
+        self.catalog: Catalog = None
+        self.load_catalog(catalog_path)
+
+    def load_catalog(self, catalog_path: Optional[str] = None) -> Catalog:
+        """
+        Open a catalog and swap it in for new requests
+
+        Requests already running keep the catalog they started with, and
+        the previous file stays mapped until the last of them finishes.
+        When replacing a catalog, its indexes are built before the swap, so
+        lookups keep using the previous catalog's instead of waiting; call
+        it from a background thread then, as CatalogWatcher does.
+        """
+        catalog = Catalog(catalog_path) if catalog_path else Catalog.from_json()
+        # New hotels get their starting rooms; existing ones keep their live count
+        self.inventory.seed(catalog.room_counts(), tag=catalog.digest)
+        if self.catalog is not None:
+            self.warm_indexes(catalog)
+        self.catalog = catalog
+        return catalog
+
+    def warm_indexes(self, catalog: Optional[Catalog] = None):
+        """Build the name and geo indexes now rather than on the first lookup that needs them"""
+        if catalog is None:
+            catalog = self.catalog
+        self._name_index(catalog)
+        self._geo_index(catalog)
+
+    def build_indexes(self) -> threading.Thread:
+        """
+        Build the current catalog's indexes on a background thread
+
+        Requests keep being served meanwhile; index_ready tells whether a
+        request needing an index can run without waiting for the build.
+        """
+        thread = threading.Thread(target=self.warm_indexes, args=(self.catalog,),
+                                  name="index-build", daemon=True)
+        thread.start()
+        return thread
+
+    def index_ready(self, name: str) -> bool:
+        """Whether the current catalog's "name" or "geo" index is built"""
+        return self.catalog.has_index(name)
 
+    @property
+    def hotels(self) -> Catalog:
+        return self.catalog
+
+    @staticmethod
+    def _name_index(catalog: Catalog) -> HotelNameIndex:
+        return catalog.index("name", HotelNameIndex)
+
+    @staticmethod
+    def _geo_index(catalog: Catalog) -> GeoIndex:
+        return catalog.index("geo", GeoIndex)
+
+    @staticmethod
+    def _location_center(catalog: Catalog, location: str) -> Tuple[Optional[Tuple[float, float]], Optional[str]]:
+        """
+        Coordinates to search around for a city name
+
+        Returns:
+            ((latitude, longitude), None), or (None, error message)
+        """
+        query = location.strip().casefold()
+        located = [c for c in catalog.locations if c["latitude"] is not None]
+        matches = [c for c in located if c["name"].casefold() == query] or \
+                  [c for c in located if query in c["name"].casefold()]
+        if not matches:
+            return None, f"No hotels found in {location}; give latitude and longitude instead"
+        if len(matches) > 1:
+            names = ", ".join(sorted(c["name"] for c in matches))
+            return None, f"{location} matches several cities ({names}); give latitude and longitude instead"
+        return (matches[0]["latitude"], matches[0]["longitude"]), None
   
-    def search_hotels(self, location: str, check_in: str, check_out: str, guests: int) -> Dict:
+    def search_hotels(self, location: Optional[str], check_in: str, check_out: str, guests: int,
+                      latitude: Optional[float] = None, longitude: Optional[float] = None,
+                      radius_km: Optional[float] = None, nearest: Optional[int] = None) -> Dict:
         """
         Search for available hotels
         
         Args:
-            location: City name
+            location: City name. With radius_km or nearest and no coordinates,
+                the search is centered on this city instead.
             check_in: Check-in date (YYYY-MM-DD)
             check_out: Check-out date (YYYY-MM-DD)
             guests: Number of guests
+            latitude: Search center latitude
+            longitude: Search center longitude
+            radius_km: Only hotels within this distance of the center
+            nearest: Only the closest available hotels, at most this many
         
         Returns:
-            Dictionary with search results
+            Dictionary with search results; hotels found around a point
+            carry distance_km and are ordered nearest first
         """
         try:
             # Parse dates
@@ -99,26 +136,49 @@ class Hotel:
                 }
             
             nights = (check_out_date - check_in_date).days
+            catalog = self.catalog
             
-            # Filter hotels by location (case insensitive)
-            matching_hotels = [
-                hotel for hotel in self.hotels 
-                if location.lower() in hotel["location"].lower()
-            ]
+            spatial = any(v is not None for v in (latitude, longitude, radius_km, nearest))
+            if spatial:
+                error = self._check_spatial(location, latitude, longitude, radius_km, nearest)
+                if error:
+                    return {"success": False, "error": error}
+                if latitude is None:
+                    center, error = self._location_center(catalog, location)
+                    if error:
+                        return {"success": False, "error": error}
+                    latitude, longitude = center
+            elif not location:
+                return {
+                    "success": False,
+                    "error": "Give a location, or latitude and longitude with radius_km or nearest"
+                }
             
-            # Simulate availability based on guests and random factors
-            available_hotels = []
-            for hotel in matching_hotels:
-                if hotel["available_rooms"] >= guests and random.random() > 0.1:  
-                    total_price = hotel["price_per_night"] * nights
-                    available_hotels.append({
-                        **hotel,
-                        "total_price": total_price,
-                        "nights": nights,
-                        "price_breakdown": f"${hotel['price_per_night']}/night x {nights} nights"
-                    })
+            cache_key = (catalog.generation, location.strip().casefold() if location else None,
+                         check_in, check_out, guests, latitude, longitude, radius_km, nearest)
+            cached = self.search_cache.get(cache_key, self.inventory.changed_since)
+            if cached is not None:
+                return {**cached, "location": location}
             
-            return {
+            # Room counts live in the shared inventory, not the catalog. Read the
+            # version first: a booking in between only makes the entry stale early.
+            version = self.inventory.version()
+            if spatial:
+                available_hotels = self._search_near(catalog, latitude, longitude, radius_km, nearest,
+                                                     check_in, check_out, guests, nights)
+            else:
+                # Filter hotels by location (case insensitive)
+                matching_hotels = list(catalog.in_locations(location))
+                rooms = self.inventory.available_rooms([h["id"] for h in matching_hotels])
+                
+                # Simulate availability based on guests and rooms sold elsewhere
+                available_hotels = []
+                for hotel in matching_hotels:
+                    available_rooms = rooms.get(hotel["id"], 0)
+                    if available_rooms >= guests and not self._sold_out(hotel["id"], check_in, check_out):
+                        available_hotels.append(self._priced(hotel, available_rooms, nights))
+            
+            result = {
                 "success": True,
                 "location": location,
                 "check_in": check_in,
@@ -128,6 +188,14 @@ class Hotel:
                 "hotels_found": len(available_hotels),
                 "hotels": available_hotels
             }
+            if spatial:
+                result["center"] = {"latitude": latitude, "longitude": longitude}
+                result["radius_km"] = radius_km
+                result["nearest"] = nearest
+            # Bookings only take rooms away, so only a change to a listed
+            # hotel can make this result wrong
+            self.search_cache.put(cache_key, result, version, (h["id"] for h in available_hotels))
+            return result
             
         except ValueError as e:
             return {
@@ -140,22 +208,110 @@ class Hotel:
                 "error": f"Search failed: {str(e)}"
             }
         
+    @staticmethod
+    def _check_spatial(location: Optional[str], latitude: Optional[float], longitude: Optional[float],
+                       radius_km: Optional[float], nearest: Optional[int]) -> Optional[str]:
+        """Error message for an invalid combination of geographic search parameters"""
+        if (latitude is None) != (longitude is None):
+            return "Give both latitude and longitude"
+        if latitude is None and not location:
+            return "Give a location or latitude and longitude to search around"
+        if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return "Latitude must be between -90 and 90 and longitude between -180 and 180"
+        if radius_km is None and nearest is None:
+            return "Give radius_km, nearest or both to search around a point"
+        if radius_km is not None and radius_km <= 0:
+            return "radius_km must be greater than 0"
+        if nearest is not None and nearest < 1:
+            return "nearest must be at least 1"
+        return None
+
+    def _search_near(self, catalog: Catalog, latitude: float, longitude: float, radius_km: Optional[float],
+                     nearest: Optional[int], check_in: str, check_out: str, guests: int,
+                     nights: int) -> List[Dict]:
+        """Available hotels around a point, nearest first"""
+        candidates = self._geo_index(catalog).nearest(latitude, longitude, radius_km)
+        # Without a count every hotel in the radius is needed; with one, read
+        # room counts a batch at a time and stop once enough are available
+        batch_size = max(64, 2 * nearest) if nearest else 1024
+        available_hotels = []
+        while nearest is None or len(available_hotels) < nearest:
+            batch = list(islice(candidates, batch_size))
+            if not batch:
+                break
+            rooms = self.inventory.available_rooms([hotel_id for hotel_id, _ in batch])
+            for hotel_id, distance in batch:
+                available_rooms = rooms.get(hotel_id, 0)
+                if available_rooms >= guests and not self._sold_out(hotel_id, check_in, check_out):
+                    available_hotels.append({
+                        **self._priced(catalog.get(hotel_id), available_rooms, nights),
+                        "distance_km": round(distance, 2)
+                    })
+                    if len(available_hotels) == nearest:
+                        break
+        return available_hotels
+
+    @staticmethod
+    def _priced(hotel: Dict, available_rooms: int, nights: int) -> Dict:
+        """Search result entry for a hotel with its live room count and stay price"""
+        return {
+            **hotel,
+            "available_rooms": available_rooms,
+            "total_price": hotel["price_per_night"] * nights,
+            "nights": nights,
+            "price_breakdown": f"${hotel['price_per_night']}/night x {nights} nights"
+        }
+
+    @staticmethod
+    def _sold_out(hotel_id: str, check_in: str, check_out: str) -> bool:
+        """About 1 in 10 hotel/date combinations is sold out through other channels"""
+        return zlib.crc32(f"{hotel_id}|{check_in}|{check_out}".encode()) % 10 == 0
+    
     def get_hotel(self, hotel: str) -> Optional[Dict]:
         """
-        Get hotel details by ID
+        Get hotel details by name or ID
+        
+        Args:
+            hotel: Hotel name or ID
+        
+        Returns:
+            Best matching hotel, or None
+        """
+        catalog = self.catalog
+        matches = self._name_index(catalog).lookup(hotel, limit=1)
+        return catalog.get(matches[0]["id"]) if matches else None
+    
+    def lookup_hotels(self, name: str, limit: int = 5) -> Dict:
+        """
+        Resolve a hotel name to ranked catalog entries
         
         Args:
-            hotel: Hotel name
+            name: Hotel name, partial name or hotel ID
+            limit: Maximum number of candidates
         
         Returns:
-            Hotel id
+            Dictionary with candidates, best match first
         """
-        hotel_lower = hotel.lower()
-        return next((h for h in self.hotels if hotel_lower in h["name"].lower()), None)
+        if limit < 1:
+            return {
+                "success": False,
+                "error": "Limit must be at least 1"
+            }
+        candidates = self._name_index(self.catalog).lookup(name, limit)
+        rooms = self.inventory.available_rooms([c["id"] for c in candidates])
+        for candidate in candidates:
+            candidate["available_rooms"] = rooms.get(candidate["id"], 0)
+        return {
+            "success": True,
+            "query": name,
+            "candidates_found": len(candidates),
+            "candidates": candidates
+        }
     
     
     def book_hotel(self, hotel_id: str, check_in: str, check_out: str, 
-                   guests: int, guest_name: str, guest_email: str) -> Dict:
+                   guests: int, guest_name: str, guest_email: str,
+                   idempotency_key: Optional[str] = None) -> Dict:
         """
         Book a hotel room
         
@@ -166,13 +322,15 @@ class Hotel:
             guests: Number of guests
             guest_name: Guest name
             guest_email: Guest email
+            idempotency_key: Optional client key; retrying with the same key
+                returns the original booking instead of booking again
         
         Returns:
             Dictionary with booking confirmation
         """
         try:
             # Find hotel
-            hotel = next((h for h in self.hotels if h["id"] == hotel_id), None)
+            hotel = self.catalog.get(hotel_id)
             if not hotel:
                 return {
                     "success": False,
@@ -192,13 +350,6 @@ class Hotel:
             nights = (check_out_date - check_in_date).days
             total_price = hotel["price_per_night"] * nights
             
-            # Check availability
-            if hotel["available_rooms"] < guests:
-                return {
-                    "success": False,
-                    "error": "Not enough rooms available"
-                }
-            
             # Generate booking confirmation
             booking_id = str(uuid.uuid4())[:8].upper()
             
@@ -218,11 +369,15 @@ class Hotel:
                 "status": "confirmed"
             }
             
-            # Store booking
-            self.bookings[booking_id] = booking_details
-            
-            # Update hotel availability (simulate)
-            hotel["available_rooms"] -= 1
+            # Check availability, take a room and store the booking in one step
+            booking_details = self.inventory.reserve(
+                hotel_id, guests, booking_id, booking_details, idempotency_key
+            )
+            if booking_details is None:
+                return {
+                    "success": False,
+                    "error": "Not enough rooms available"
+                }
             
             return {
                 "success": True,
@@ -243,7 +398,7 @@ class Hotel:
     
     def get_booking(self, booking_id: str) -> Dict:
         """Get booking details by booking ID"""
-        booking = self.bookings.get(booking_id)
+        booking = self.inventory.get_booking(booking_id)
         if booking:
             return {
                 "success": True,
@@ -1,17 +1,105 @@
-from fastapi import FastAPI 
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from hotel import Hotel 
 from weather import Weather
+from single_flight import SingleFlight, make_key
+from admission import AdmissionClass, AdmissionControl
+from weather_store import WeatherStore
+from catalog import CatalogWatcher
 
-app = FastAPI(title="Hotel Booking API", description="API for searching and booking hotels")
-_hotel = Hotel()
-_weather = Weather()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve right away; lookups and geographic searches answer 503 until the build is done
+    _hotel.build_indexes()
+    _weather_store.start()
+    if _catalog_watcher is not None:
+        _catalog_watcher.start()
+    yield
+    if _catalog_watcher is not None:
+        _catalog_watcher.stop()
+    _weather_store.stop()
+
+app = FastAPI(title="Hotel Booking API", description="API for searching and booking hotels", lifespan=lifespan)
+
+# Per-route-class concurrency limits. Bookings get their own slots so a burst
+# of searches can't starve them, and the totals stay under the default
+# 40-thread pool so admitted requests never wait for a thread.
+_admission = {
+    "weather": AdmissionClass("weather", max_concurrency=16, max_queue=32, queue_timeout=1.0),
+    "hotel_read": AdmissionClass("hotel_read", max_concurrency=12, max_queue=24, queue_timeout=2.0),
+    "booking": AdmissionClass("booking", max_concurrency=8, max_queue=32, queue_timeout=5.0),
+}
+
+def _admission_class(method: str, path: str):
+    if path.endswith("/health") or path == "/metrics":
+        return None
+    if path == "/hotel/book":
+        return "booking"
+    if path.startswith("/hotel/"):
+        return "hotel_read"
+    if path.startswith("/weather/"):
+        return "weather"
+    return None
+
+app.add_middleware(AdmissionControl, classes=_admission, classify=_admission_class)
+
+# Set HOTEL_DB_PATH when running with --workers N so every worker shares one inventory.
+# HOTEL_CATALOG_PATH points at a catalog file (python catalog.py build ...); replacing
+# that file swaps the new catalog in without a restart.
+_catalog_path = os.environ.get("HOTEL_CATALOG_PATH")
+_hotel = Hotel(db_path=os.environ.get("HOTEL_DB_PATH"), catalog_path=_catalog_path)
+_weather = Weather(_hotel.catalog.climates or None)
+
+def _weather_locations():
+    return [city.title() for city in _weather.city_base_temps] + [c["name"] for c in _hotel.catalog.locations]
+
+# Weather for known cities is generated in the background and served pre-serialized
+_weather_store = WeatherStore(
+    _weather,
+    locations=_weather_locations(),
+    refresh_seconds=float(os.environ.get("WEATHER_REFRESH_SECONDS", "300")),
+)
+
+def _reload_catalog(path: str):
+    catalog = _hotel.load_catalog(path)
+    if catalog.climates:
+        _weather.city_base_temps = catalog.climates
+    _weather_store.set_locations(_weather_locations())
+    print(f"Loaded catalog {path}: {len(catalog)} hotels")
+
+_catalog_watcher = CatalogWatcher(
+    _catalog_path, _reload_catalog, interval=float(os.environ.get("CATALOG_CHECK_SECONDS", "5"))
+) if _catalog_path else None
+# Identical reads arriving together share one computation
+_coalesce = SingleFlight()
+
+# Seconds a client is asked to wait while the catalog's indexes are still building
+INDEX_RETRY_AFTER = 5
+
+def _index_not_ready(name: str) -> Optional[JSONResponse]:
+    """503 with Retry-After while the catalog's name or geo index is still being built"""
+    if _hotel.index_ready(name):
+        return None
+    return JSONResponse(
+        {"success": False, "error": "The hotel catalog is still loading, please retry shortly"},
+        status_code=503,
+        headers={"Retry-After": str(INDEX_RETRY_AFTER)},
+    )
 
 class SearchHotelsRequest(BaseModel):
-    location: str = Field(..., description="City or location")
+    location: Optional[str] = Field(None, description="City or location")
     check_in: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}$")
     check_out: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}$")
     guests: int = Field(..., ge=1)
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Search center latitude")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Search center longitude")
+    radius_km: Optional[float] = Field(None, gt=0, description="Only hotels within this distance")
+    nearest: Optional[int] = Field(None, ge=1, le=100, description="Only the closest N available hotels")
 
 class BookHotelRequest(BaseModel):
     hotel_id: str
@@ -30,27 +118,73 @@ def hotel_health():
         "status": "ok"
     }
 
+@app.get("/metrics")
+def metrics():
+    """Request coalescing, admission control, search cache, catalog and weather store counters"""
+    catalog = _hotel.catalog
+    return {
+        "single_flight": dict(_coalesce.stats),
+        "admission": {
+            name: {**a.stats, "active": a.active, "service_time_ms": round(a.service_time * 1000, 2)}
+            for name, a in _admission.items()
+        },
+        "search_cache": _hotel.search_cache.metrics(),
+        "catalog": {
+            "path": catalog.path,
+            "hotels": len(catalog),
+            "digest": catalog.digest,
+            "generation": catalog.generation,
+            "loaded_at": catalog.loaded_at,
+            "indexes_ready": {name: catalog.has_index(name) for name in ("name", "geo")},
+        },
+        "weather_store": {
+            "locations": len(_weather_store.locations),
+            "refreshed_at": _weather_store.refreshed_at,
+            "refresh_ms": round(_weather_store.refresh_duration * 1000, 2),
+        },
+    }
+
 @app.post("/hotel/search")
 def search_hotels(request: SearchHotelsRequest):
-    """Search for available hotels in a location for specific dates"""
-    return _hotel.search_hotels(request.location, request.check_in, request.check_out, request.guests)
+    """Search for available hotels in a location, or around a point, for specific dates"""
+    if any(v is not None for v in (request.latitude, request.longitude, request.radius_km, request.nearest)):
+        not_ready = _index_not_ready("geo")
+        if not_ready is not None:
+            return not_ready
+    return _coalesce.do(
+        make_key("/hotel/search", fold_case=("location",), **request.model_dump()),
+        lambda: _hotel.search_hotels(request.location, request.check_in, request.check_out, request.guests,
+                                     request.latitude, request.longitude, request.radius_km, request.nearest)
+    )
+
+@app.get("/hotel/lookup")
+def lookup_hotel(name: str, limit: int = 5):
+    """Resolve a hotel name or ID to ranked catalog entries"""
+    not_ready = _index_not_ready("name")
+    if not_ready is not None:
+        return not_ready
+    return _coalesce.do(make_key("/hotel/lookup", name=name, limit=limit),
+                        lambda: _hotel.lookup_hotels(name, limit))
 
 @app.post("/hotel/book")
-def book_hotel(request: BookHotelRequest):
-    """Book a hotel room"""
+def book_hotel(request: BookHotelRequest,
+               idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """Book a hotel room. Retries carrying the same Idempotency-Key return the original booking."""
     return _hotel.book_hotel(
         request.hotel_id, 
         request.check_in, 
         request.check_out, 
         request.guests, 
         request.guest_name, 
-        request.guest_email
+        request.guest_email,
+        idempotency_key
     )
 
 @app.post("/hotel/booking/{booking_id}")
 def get_booking(booking_id: str):
     """Retrieve booking details by booking ID"""
-    return _hotel.get_booking(booking_id)
+    return _coalesce.do(make_key("/hotel/booking", booking_id=booking_id),
+                        lambda: _hotel.get_booking(booking_id))
 
 # ------------------ WEATHER APIs ------------------ #
 
@@ -65,15 +199,27 @@ def weather_health():
 @app.get("/weather/current")
 def get_current_weather(location: str):
     """Get current weather for a location"""
-    return _weather.get_current_weather(location)
+    stored = _weather_store.payload("current", location)
+    if stored is not None:
+        return Response(stored, media_type="application/json")
+    return _coalesce.do(make_key("/weather/current", fold_case=("location",), location=location),
+                        lambda: _weather.get_current_weather(location))
 
 @app.get("/weather/forecast")
 def get_weather_forecast(location: str, days: int = 5):
     """Weather forecast for a location for given number of days. Defaults to 5 days."""
     print("In API: Getting weather forecast for", location, "for", days, "days")
-    return _weather.get_forecast(location, days)    
+    stored = _weather_store.payload("forecast", location, days)
+    if stored is not None:
+        return Response(stored, media_type="application/json")
+    return _coalesce.do(make_key("/weather/forecast", fold_case=("location",), location=location, days=days),
+                        lambda: _weather.get_forecast(location, days))
 
 @app.get("/weather/alerts")
 def get_weather_alerts(location: str):
     """Weather alerts for a location"""
-    return _weather.get_weather_alerts(location)    
\ No newline at end of file
+    stored = _weather_store.payload("alerts", location)
+    if stored is not None:
+        return Response(stored, media_type="application/json")
+    return _coalesce.do(make_key("/weather/alerts", fold_case=("location",), location=location),
+                        lambda: _weather.get_weather_alerts(location))
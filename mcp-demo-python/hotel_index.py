@@ -0,0 +1,224 @@
+"""
+Hotel Name Index
+Resolves free-text hotel names to catalog entries using exact tokens,
+a prefix trie and a trigram index for misspellings
+"""
+
+import re
+import unicodedata
+from collections import defaultdict, deque
+from itertools import chain, islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Weights for how a query token matched a name token
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+MAX_PREFIX_EXPANSIONS = 300  # name tokens tried per query prefix, shortest first
+MIN_TRIGRAM_SIMILARITY = 0.3
+MAX_TRIGRAM_POSTINGS = 1000  # trigrams shared by more tokens than this are skipped
+MAX_CANDIDATES = 200         # hotels scored per query
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "token")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.token: Optional[str] = None
+
+
+class HotelNameIndex:
+    def __init__(self, hotels: List[Dict]):
+        """
+        Build the index over a hotel catalog
+
+        Args:
+            hotels: Catalog entries with unique "id" and a "name"
+        """
+        self.hotels = hotels
+        self._by_id = {h["id"]: i for i, h in enumerate(hotels)}
+        self._names: List[str] = []
+        self._tokens: List[Tuple[str, ...]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._by_name: Dict[str, int] = {}             # normalized name -> first hotel with it
+        self._same_name: Dict[str, List[int]] = {}     # only names shared by several hotels
+
+        for i, hotel in enumerate(hotels):
+            tokens = tuple(tokenize(hotel["name"]))
+            name = " ".join(tokens)
+            self._names.append(name)
+            self._tokens.append(tokens)
+            first = self._by_name.setdefault(name, i)
+            if first != i:
+                self._same_name.setdefault(name, [first]).append(i)
+            for token in set(tokens):
+                self._postings[token].append(i)
+
+        self._trie = _TrieNode()
+        self._trigrams: Dict[str, List[str]] = defaultdict(list)
+        for token in self._postings:
+            self._insert(token)
+            for gram in trigrams(token):
+                self._trigrams[gram].append(token)
+
+    def _insert(self, token: str):
+        node = self._trie
+        for ch in token:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.token = token
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        """Name tokens starting with prefix, closest completions first"""
+        node = self._trie
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        found, queue = [], deque([node])
+        while queue and len(found) < MAX_PREFIX_EXPANSIONS:
+            node = queue.popleft()
+            if node.token is not None:
+                found.append(node.token)
+            queue.extend(node.children.values())
+        return found
+
+    def _similar(self, token: str) -> Dict[str, float]:
+        """Name tokens sharing enough trigrams with token (Jaccard similarity)"""
+        grams = trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            postings = self._trigrams.get(gram, ())
+            # Very common trigrams cost the most and discriminate the least
+            if len(postings) > MAX_TRIGRAM_POSTINGS:
+                continue
+            for candidate in postings:
+                shared[candidate] += 1
+        similar = {}
+        for candidate, count in shared.items():
+            # Jaccard can't reach the threshold if too few trigrams are shared
+            if count < MIN_TRIGRAM_SIMILARITY * len(grams):
+                continue
+            score = count / (len(grams) + len(trigrams(candidate)) - count)
+            if score >= MIN_TRIGRAM_SIMILARITY:
+                similar[candidate] = score
+        return similar
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Every name token the query token could mean, with its match weight"""
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_WEIGHT
+        for candidate in self._prefixed(token):
+            matches.setdefault(candidate, PREFIX_WEIGHT)
+        if not matches:
+            for candidate, score in self._similar(token).items():
+                matches[candidate] = FUZZY_WEIGHT * score
+        return matches
+
+    def lookup(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Rank catalog entries against a hotel name or ID
+
+        Args:
+            query: Hotel name (partial, misspelled or exact) or hotel ID
+            limit: Maximum number of candidates
+
+        Returns:
+            Hotels with a "score" between 0 and 1, best first, and a "match":
+            "exact" when every query word is a word of the name, "close" when
+            some only matched as a prefix or misspelling, "partial" when some
+            matched nothing
+        """
+        if query in self._by_id:
+            return [{**self.hotels[self._by_id[query]], "score": 1.0, "match": "exact"}]
+
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        expansions = [self._expand(token) for token in query_tokens]
+
+        normalized_query = " ".join(query_tokens)
+        candidates = self._candidates(expansions)
+        # Hotels named exactly as asked always compete, however many others matched
+        if normalized_query in self._by_name:
+            candidates.update(self._same_name.get(normalized_query, [self._by_name[normalized_query]]))
+        scored = []
+        for i in candidates:
+            name_tokens = self._tokens[i]
+            total, matched, exact = 0.0, 0, 0
+            for token, matches in zip(query_tokens, expansions):
+                best = 0.0
+                for name_token in name_tokens:
+                    weight = matches.get(name_token, 0.0)
+                    if weight > best:
+                        best = weight
+                total += best
+                matched += best > 0
+                exact += best == EXACT_WEIGHT
+            # Prefer names without extra words the user didn't type
+            score = total / max(len(query_tokens), len(name_tokens))
+            if self._names[i] == normalized_query:
+                score = 1.0
+            if exact == len(query_tokens):
+                match = "exact"
+            elif matched == len(query_tokens):
+                match = "close"
+            else:
+                match = "partial"
+            scored.append((score, i, match))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [{**self.hotels[i], "score": round(score, 3), "match": match} for score, i, match in scored[:limit]]
+
+    def _candidates(self, expansions: List[Dict[str, float]]) -> Set[int]:
+        """
+        Hotels worth scoring: those matching as many query tokens as possible
+
+        Postings are intersected rarest token first, with set operations that
+        run in C, so a query made of common words never scores a whole
+        posting list. A token that would leave nothing (an extra word, a bad
+        typo) is skipped rather than emptying the set.
+        """
+        def postings(matches: Dict[str, float]) -> Iterable[int]:
+            return chain.from_iterable(self._postings[t] for t in matches)
+
+        sized = sorted((sum(len(self._postings[t]) for t in m), j, m) for j, m in enumerate(expansions) if m)
+        candidates: Optional[Set[int]] = None
+        if len(sized) == 1:
+            return set(islice(postings(sized[0][2]), MAX_CANDIDATES))
+        for size, _, matches in sized:
+            if candidates is None:
+                hits = set(postings(matches))
+            elif len(candidates) * 8 < size:
+                # Few candidates left: checking their own tokens beats walking the postings
+                wanted = matches.keys()
+                hits = {i for i in candidates if not wanted.isdisjoint(self._tokens[i])}
+            else:
+                hits = candidates.intersection(postings(matches))
+            if hits:
+                candidates = hits
+        if candidates is None:
+            return set()
+        if len(candidates) > MAX_CANDIDATES:
+            # Everything left matched the same tokens, so any of them ranks about as well
+            candidates = set(islice(candidates, MAX_CANDIDATES))
+        return candidates
@@ -0,0 +1,216 @@
+"""
+Shared Inventory Store
+Keeps room availability and bookings in SQLite so several API worker
+processes see the same state
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Host parameters per statement; SQLite builds before 3.32 allow only 999
+_MAX_PARAMS = 900
+# Rows per seeding transaction, so bookings in other workers wait milliseconds, not seconds
+SEED_BATCH = 5000
+
+
+class Inventory:
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Open (or create) the inventory database
+
+        Args:
+            db_path: SQLite file shared by all workers. When omitted an
+                in-memory database private to this process is used.
+        """
+        self.db_path = db_path or ":memory:"
+        self._in_memory = self.db_path == ":memory:"
+        self._local = threading.local()
+        # sqlite3 connections can't be used from two threads at once
+        self._guard = threading.Lock() if self._in_memory else contextlib.nullcontext()
+        self._memory_conn = self._connect() if self._in_memory else None
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30.0,
+            isolation_level=None,  # explicit BEGIN/COMMIT below
+            check_same_thread=not self._in_memory,
+        )
+        if not self._in_memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection for the calling thread (file databases use one per thread)"""
+        if self._in_memory:
+            return self._memory_conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        with self._guard:
+            conn = self._conn()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rooms ("
+                " hotel_id TEXT PRIMARY KEY,"
+                " available_rooms INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bookings ("
+                " booking_id TEXT PRIMARY KEY,"
+                " hotel_id TEXT NOT NULL,"
+                " details TEXT NOT NULL)"
+            )
+            # Every availability change, in order; seq doubles as the inventory version
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " hotel_id TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS seeded (tag TEXT PRIMARY KEY)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                " idempotency_key TEXT PRIMARY KEY,"
+                " booking_id TEXT NOT NULL)"
+            )
+
+    def seed(self, rooms: Iterable[Tuple[str, int]], tag: Optional[str] = None):
+        """
+        Insert starting room counts; hotels already present keep their live count
+
+        Args:
+            rooms: (hotel ID, starting rooms) pairs
+            tag: Identifies this set of rooms, e.g. a catalog digest. Seeding
+                with a tag already recorded is skipped, so workers restarting
+                against a shared file don't rewrite every row.
+        """
+        if tag is not None:
+            with self._guard:
+                if self._conn().execute("SELECT 1 FROM seeded WHERE tag = ?", (tag,)).fetchone():
+                    return
+        # Each batch takes the write lock on its own. Rows are only ever
+        # inserted, so a seed interrupted part way is finished by the next.
+        rooms = iter(rooms)
+        while True:
+            batch = list(islice(rooms, SEED_BATCH))
+            if not batch:
+                break
+            self._write(lambda conn: conn.executemany(
+                "INSERT OR IGNORE INTO rooms (hotel_id, available_rooms) VALUES (?, ?)", batch
+            ))
+        if tag is not None:
+            self._write(lambda conn: conn.execute("INSERT OR IGNORE INTO seeded (tag) VALUES (?)", (tag,)))
+
+    def _write(self, statements: Callable[[sqlite3.Connection], object]):
+        """Run statements in one write transaction"""
+        with self._guard:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                statements(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def available_rooms(self, hotel_ids: List[str]) -> Dict[str, int]:
+        """Current room counts for the given hotel IDs"""
+        rooms = {}
+        with self._guard:
+            conn = self._conn()
+            for start in range(0, len(hotel_ids), _MAX_PARAMS):
+                chunk = hotel_ids[start:start + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rooms.update(conn.execute(
+                    f"SELECT hotel_id, available_rooms FROM rooms WHERE hotel_id IN ({placeholders})",
+                    chunk,
+                ))
+        return rooms
+
+    def version(self) -> int:
+        """Inventory version: grows with every availability change in any worker"""
+        with self._guard:
+            return self._conn().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changed_since(self, version: int) -> Tuple[int, Set[str]]:
+        """
+        Hotels whose availability changed after version
+
+        Returns:
+            (current version, IDs of hotels changed since the given version)
+        """
+        with self._guard:
+            rows = self._conn().execute(
+                "SELECT seq, hotel_id FROM changes WHERE seq > ? ORDER BY seq", (version,)
+            ).fetchall()
+        if not rows:
+            return version, set()
+        return rows[-1][0], {hotel_id for _, hotel_id in rows}
+
+    def reserve(self, hotel_id: str, guests: int, booking_id: str, details: Dict,
+                idempotency_key: Optional[str] = None) -> Optional[Dict]:
+        """
+        Atomically take one room and record the booking
+
+        Args:
+            idempotency_key: Client-chosen key; repeating a key returns the
+                booking made the first time instead of taking another room
+
+        Returns:
+            The stored booking details, or None when fewer than ``guests``
+            rooms are left
+        """
+        with self._guard:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key:
+                    row = conn.execute(
+                        "SELECT b.details FROM idempotency_keys k"
+                        " JOIN bookings b ON b.booking_id = k.booking_id"
+                        " WHERE k.idempotency_key = ?",
+                        (idempotency_key,),
+                    ).fetchone()
+                    if row:
+                        conn.execute("ROLLBACK")
+                        return json.loads(row[0])
+                cursor = conn.execute(
+                    "UPDATE rooms SET available_rooms = available_rooms - 1"
+                    " WHERE hotel_id = ? AND available_rooms >= ?",
+                    (hotel_id, guests),
+                )
+                if cursor.rowcount == 0:
+                    conn.execute("ROLLBACK")
+                    return None
+                conn.execute("INSERT INTO changes (hotel_id) VALUES (?)", (hotel_id,))
+                conn.execute(
+                    "INSERT INTO bookings (booking_id, hotel_id, details) VALUES (?, ?, ?)",
+                    (booking_id, hotel_id, json.dumps(details)),
+                )
+                if idempotency_key:
+                    conn.execute(
+                        "INSERT INTO idempotency_keys (idempotency_key, booking_id) VALUES (?, ?)",
+                        (idempotency_key, booking_id),
+                    )
+                conn.execute("COMMIT")
+                return details
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get_booking(self, booking_id: str) -> Optional[Dict]:
+        with self._guard:
+            row = self._conn().execute(
+                "SELECT details FROM bookings WHERE booking_id = ?", (booking_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
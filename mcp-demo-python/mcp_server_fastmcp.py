@@ -1,20 +1,68 @@
 from pydantic import Field
-from typing import Annotated
+from typing import Annotated, Callable, Literal, Optional
 from fastmcp import FastMCP
-import httpx
+from fastmcp.tools.tool import ToolResult
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from backend_client import BackendClient, BackendUnavailable
+import json
+import uuid
 
 mcp  = FastMCP(name="Hotel & Weather API MCP Server")
 
 API_BASE = "http://127.0.0.1:8000"
 
+# Seconds each tool may spend waiting on the API, retries and hedges included
+TOOL_BUDGETS = {
+    "search_hotels": 5.0,
+    "get_hotel": 2.0,
+    "book_hotel": 10.0,
+    "get_booking": 3.0,
+    "get_current_weather": 3.0,
+    "get_weather_forecast": 3.0,
+    "get_weather_alerts": 3.0,
+}
+
+_backend = BackendClient(API_BASE, budgets=TOOL_BUDGETS)
+
+
+async def _call_api(tool: str, method: str, path: str, idempotent: bool = True, **kwargs) -> dict:
+    """API payload, or an error payload when the backend can't answer in the tool's budget"""
+    try:
+        data = await _backend.request(tool, method, path, idempotent=idempotent, **kwargs)
+    except BackendUnavailable as e:
+        return {"success": False, "error": str(e)}
+    if not isinstance(data, dict) or "success" not in data:
+        # FastAPI's own rejections (422 validation, 404/405 routing) only carry
+        # detail; tool output schemas require success
+        return {"success": False, "error": _error_detail(data)}
+    return data
+
+
+def _error_detail(data) -> str:
+    detail = data.get("detail") if isinstance(data, dict) else None
+    if isinstance(detail, list):
+        # Validation errors: [{"loc": ["body", "check_in"], "msg": "..."}]
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error.get('loc', [])[1:]) or 'request'}: {error.get('msg', 'invalid')}"
+            for error in detail if isinstance(error, dict)
+        ) or "Invalid request"
+    return str(detail) if detail else "Unexpected response from the API"
+
 
 def _fmt_hotels(data: dict) -> str:
     if not data.get("success"):
         return f"❌ {data.get('error', 'Unknown error')}"
-    lines = [f"Found {data['hotels_found']} hotels in {data['location']}:\n"]
+    if "center" in data:
+        around = data["location"] or f"{data['center']['latitude']}, {data['center']['longitude']}"
+        where = f"within {data['radius_km']} km of" if data.get("radius_km") else "nearest to"
+        lines = [f"Found {data['hotels_found']} hotels {where} {around}:\n"]
+    else:
+        lines = [f"Found {data['hotels_found']} hotels in {data['location']}:\n"]
     for hotel in data.get("hotels", []):
         lines.append(f"🏨 **{hotel['name']}**")
-        lines.append(f"   📍 {hotel['location']}")
+        distance = f" ({hotel['distance_km']} km away)" if "distance_km" in hotel else ""
+        lines.append(f"   📍 {hotel['location']}{distance}")
         lines.append(    f"   💰 ${hotel['price_per_night']}/night (Total: ${hotel['total_price']} for {hotel['nights']} nights)")
         lines.append(    f"   ⭐ Rating: {hotel['rating']}/5")
         lines.append(    f"   🛏️ Available rooms: {hotel['available_rooms']}")
@@ -23,6 +71,19 @@ def _fmt_hotels(data: dict) -> str:
 
     return "\n".join([ln for ln in lines if ln])
 
+def _fmt_hotel_lookup(data: dict) -> str:
+    if not data.get("success"):
+        return f"❌ {data.get('error', 'Unknown error')}"
+    if not data["candidates"]:
+        return f"No hotels match '{data['query']}'"
+    lines = [f"Hotels matching '{data['query']}':\n"]
+    for hotel in data["candidates"]:
+        lines.append(f"🏨 **{hotel['name']}** (match {hotel['score']:.0%})")
+        lines.append(f"   📍 {hotel['location']}")
+        lines.append(f"   💰 ${hotel['price_per_night']}/night")
+        lines.append(f"   🎯 Hotel ID: {hotel['id']}\n")
+    return "\n".join(lines)
+
 def _fmt_booking(data: dict) -> str:
     if not data.get("success"):
         return f"❌ {data.get('error', 'Unknown error')}"
@@ -91,72 +152,297 @@ def _format_weather_alerts(data: dict) -> str:
     return "\n".join([ln for ln in lines if ln])
 
 
+# One-line summaries for the default text block; the details are in the structured content
+
+def _summarize_hotels(data: dict) -> str:
+    if "center" in data:
+        around = data["location"] or f"{data['center']['latitude']}, {data['center']['longitude']}"
+        where = f"within {data['radius_km']} km of" if data.get("radius_km") else "nearest to"
+        return f"Found {data['hotels_found']} hotels {where} {around}"
+    return f"Found {data['hotels_found']} hotels in {data['location']}"
+
+def _summarize_hotel_lookup(data: dict) -> str:
+    if not data["candidates"]:
+        return f"No hotels match '{data['query']}'"
+    best = data["candidates"][0]
+    return f"{data['candidates_found']} hotels match '{data['query']}', best {best['name']} ({best['id']})"
+
+def _summarize_booking(data: dict) -> str:
+    b = data["booking"]
+    return f"Booking {b['booking_id']} {b['status']}: {b['hotel_name']}, {b['check_in']} to {b['check_out']}, ${b['total_price']}"
+
+def _summarize_current_weather(data: dict) -> str:
+    weather = data["weather"]
+    return f"{weather['location']}: {weather['temperature_celsius']}°C, {weather['condition']}"
+
+def _summarize_weather_forecast(data: dict) -> str:
+    days = data["forecast"]
+    low = min(day["temperature_low_celsius"] for day in days)
+    high = max(day["temperature_high_celsius"] for day in days)
+    return f"{data['forecast_days']}-day forecast for {data['location']}: {low}°C to {high}°C"
+
+def _summarize_weather_alerts(data: dict) -> str:
+    return f"{data['alert_count']} active weather alerts for {data['location']}"
+
+
+# ------------------ STRUCTURED OUTPUT ------------------ #
+
+OutputFormat = Annotated[
+    Literal["summary", "markdown", "json"],
+    Field(description="summary gives a one-line text; markdown renders every detail for people; json "
+                      "repeats the data as compact JSON text. The data is always in the structured content")
+]
+
+
+def _object(properties: dict) -> dict:
+    """Output schema for an API payload; every payload carries success and, on failure, error"""
+    return {
+        "type": "object",
+        "properties": {"success": {"type": "boolean"}, "error": {"type": "string"}, **properties},
+        "required": ["success"],
+    }
+
+
+HOTEL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "name": {"type": "string"},
+        "location": {"type": "string"},
+        "price_per_night": {"type": "number"},
+        "rating": {"type": "number"},
+        "amenities": {"type": "array", "items": {"type": "string"}},
+        "available_rooms": {"type": "integer"},
+        "total_price": {"type": "number"},
+        "nights": {"type": "integer"},
+        "latitude": {"type": "number"},
+        "longitude": {"type": "number"},
+        "distance_km": {"type": "number"},
+    },
+}
+
+BOOKING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "booking_id": {"type": "string"},
+        "hotel_name": {"type": "string"},
+        "hotel_location": {"type": "string"},
+        "check_in": {"type": "string"},
+        "check_out": {"type": "string"},
+        "nights": {"type": "integer"},
+        "guests": {"type": "integer"},
+        "guest_name": {"type": "string"},
+        "guest_email": {"type": "string"},
+        "total_price": {"type": "number"},
+        "price_per_night": {"type": "number"},
+        "booking_date": {"type": "string"},
+        "status": {"type": "string"},
+    },
+}
+
+SEARCH_HOTELS_OUTPUT = _object({
+    "location": {"type": ["string", "null"]},
+    "center": {
+        "type": "object",
+        "properties": {"latitude": {"type": "number"}, "longitude": {"type": "number"}},
+    },
+    "radius_km": {"type": ["number", "null"]},
+    "nearest": {"type": ["integer", "null"]},
+    "check_in": {"type": "string"},
+    "check_out": {"type": "string"},
+    "guests": {"type": "integer"},
+    "nights": {"type": "integer"},
+    "hotels_found": {"type": "integer"},
+    "hotels": {"type": "array", "items": HOTEL_SCHEMA},
+})
+
+HOTEL_LOOKUP_OUTPUT = _object({
+    "query": {"type": "string"},
+    "candidates_found": {"type": "integer"},
+    "candidates": {
+        "type": "array",
+        "items": {**HOTEL_SCHEMA, "properties": {
+            **HOTEL_SCHEMA["properties"],
+            "score": {"type": "number"},
+            "match": {"type": "string", "enum": ["exact", "close", "partial"]},
+        }},
+    },
+})
+
+BOOKING_OUTPUT = _object({
+    "message": {"type": "string"},
+    "booking": BOOKING_SCHEMA,
+})
+
+CURRENT_WEATHER_OUTPUT = _object({
+    "weather": {
+        "type": "object",
+        "properties": {
+            "location": {"type": "string"},
+            "timestamp": {"type": "string"},
+            "temperature_celsius": {"type": "integer"},
+            "temperature_fahrenheit": {"type": "integer"},
+            "condition": {"type": "string"},
+            "humidity": {"type": "integer"},
+            "wind_speed_kmh": {"type": "integer"},
+            "visibility_km": {"type": "integer"},
+            "uv_index": {"type": "integer"},
+            "precipitation_mm": {"type": "integer"},
+        },
+    },
+})
+
+WEATHER_FORECAST_OUTPUT = _object({
+    "location": {"type": "string"},
+    "forecast_days": {"type": "integer"},
+    "generated_at": {"type": "string"},
+    "forecast": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "date": {"type": "string"},
+                "day_of_week": {"type": "string"},
+                "temperature_high_celsius": {"type": "integer"},
+                "temperature_low_celsius": {"type": "integer"},
+                "temperature_high_fahrenheit": {"type": "integer"},
+                "temperature_low_fahrenheit": {"type": "integer"},
+                "condition": {"type": "string"},
+                "humidity": {"type": "integer"},
+                "wind_speed_kmh": {"type": "integer"},
+                "precipitation_chance": {"type": "integer"},
+                "precipitation_mm": {"type": "integer"},
+            },
+        },
+    },
+})
+
+WEATHER_ALERTS_OUTPUT = _object({
+    "location": {"type": "string"},
+    "alert_count": {"type": "integer"},
+    "alerts": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string"},
+                "severity": {"type": "string"},
+                "issued_at": {"type": "string"},
+                "expires_at": {"type": "string"},
+                "description": {"type": "string"},
+            },
+        },
+    },
+})
+
+
+def _result(data: dict, format: str, render: Callable[[dict], str],
+            summarize: Callable[[dict], str]) -> ToolResult:
+    """
+    Wrap an API payload as an MCP tool result
+
+    The payload is always returned as structured content, so by default the
+    text block is only a one-line summary of it. markdown mode renders every
+    detail for display, and json mode repeats the payload as compact JSON
+    text; both carry the data twice. Failures are one line in any mode.
+    """
+    if format == "json":
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    elif format == "markdown" or not data.get("success"):
+        text = render(data)
+    else:
+        text = summarize(data)
+    return ToolResult(content=text, structured_content=data)
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> JSONResponse:
+    """Backend client counters, including how many tool calls were coalesced"""
+    return JSONResponse({
+        "backend": _backend.stats,
+        "single_flight": _backend.single_flight.stats,
+    })
+
+
 # ------------------ HOTEL TOOLS ------------------ #
 
-@mcp.tool
-def search_hotels(location:Annotated[str, Field(..., description="city or location")], 
-                 check_in: Annotated[str, Field(..., description="Check-in date YYYY-MM-DD")], 
-                 check_out: Annotated[str, Field(..., description="Check-out date YYYY-MM-DD")], 
-                 guests: Annotated[int, Field(..., ge=1, description="number of guests")] ) -> str:
-    """Search for available hotels in a location for specific dates and number of guests."""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.post("/hotel/search", json={
-            "location": location, "check_in": check_in, "check_out": check_out, "guests": guests
-        })
-        data = r.json() 
-    return _fmt_hotels(data)
-
-
-@mcp.tool
-def book_hotel(hotel_id: str, check_in:str, check_out:str, guests:Annotated[int, Field(..., ge=1)], guest_name:str, guest_email:str) -> str:
+@mcp.tool(output_schema=SEARCH_HOTELS_OUTPUT)
+async def search_hotels(check_in: Annotated[str, Field(..., description="Check-in date YYYY-MM-DD")], 
+                       check_out: Annotated[str, Field(..., description="Check-out date YYYY-MM-DD")], 
+                       guests: Annotated[int, Field(..., ge=1, description="number of guests")],
+                       location: Annotated[Optional[str], Field(description="city or location")] = None,
+                       latitude: Annotated[Optional[float], Field(ge=-90, le=90, description="Search center latitude")] = None,
+                       longitude: Annotated[Optional[float], Field(ge=-180, le=180, description="Search center longitude")] = None,
+                       radius_km: Annotated[Optional[float], Field(gt=0, description="Only hotels within this many km of the center")] = None,
+                       nearest: Annotated[Optional[int], Field(ge=1, le=100, description="Only the N closest available hotels")] = None,
+                       format: OutputFormat = "summary") -> ToolResult:
+    """Search for available hotels for specific dates and number of guests, either in a city
+    (location) or around a point: give radius_km and/or nearest with latitude and longitude,
+    or with just a location to search around that city's center. Results around a point are
+    ordered nearest first with distance_km."""
+    payload = {"location": location, "check_in": check_in, "check_out": check_out, "guests": guests}
+    # Only send the geographic fields in use, so plain city searches stay as before
+    payload.update({k: v for k, v in (("latitude", latitude), ("longitude", longitude),
+                                      ("radius_km", radius_km), ("nearest", nearest)) if v is not None})
+    data = await _call_api("search_hotels", "POST", "/hotel/search", json=payload)
+    return _result(data, format, _fmt_hotels, _summarize_hotels)
+
+
+@mcp.tool(output_schema=HOTEL_LOOKUP_OUTPUT)
+async def get_hotel(name: Annotated[str, Field(..., description="Hotel name, partial name or hotel ID")],
+                    limit: Annotated[int, Field(description="Maximum number of candidates", ge=1, le=20)] = 5,
+                    format: OutputFormat = "summary") -> ToolResult:
+    """Find hotels by name and return their IDs, best match first. Use this to get the hotel_id for book_hotel."""
+    data = await _call_api("get_hotel", "GET", "/hotel/lookup", params={"name": name, "limit": limit})
+    return _result(data, format, _fmt_hotel_lookup, _summarize_hotel_lookup)
+
+
+@mcp.tool(output_schema=BOOKING_OUTPUT)
+async def book_hotel(hotel_id: str, check_in:str, check_out:str, guests:Annotated[int, Field(..., ge=1)], guest_name:str, guest_email:str,
+                     format: OutputFormat = "summary") -> ToolResult:
     """Book a hotel room"""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.post("/hotel/book", json={
-            "hotel_id": hotel_id, "check_in": check_in, "check_out": check_out, 
-            "guests": guests, "guest_name": guest_name, "guest_email": guest_email
-        })
-        data = r.json()
-    return _fmt_booking(data) if data.get("success") else f"❌ Booking failed: {data.get('error','Unknown error')}"
+    payload = {
+        "hotel_id": hotel_id, "check_in": check_in, "check_out": check_out, 
+        "guests": guests, "guest_name": guest_name, "guest_email": guest_email
+    }
+    # One key per tool call, so a retried request can't book a second room
+    data = await _call_api("book_hotel", "POST", "/hotel/book", idempotent=False,
+                           idempotency_key=uuid.uuid4().hex, json=payload)
+    return _result(data, format, lambda d: _fmt_booking(d) if d.get("success") else f"❌ Booking failed: {d.get('error','Unknown error')}",
+                   _summarize_booking)
 
 
-@mcp.tool
-def get_booking(booking_id : str) -> str:
+@mcp.tool(output_schema=BOOKING_OUTPUT)
+async def get_booking(booking_id : str, format: OutputFormat = "summary") -> ToolResult:
     """Retrieve booking by ID"""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.post(f"/hotel/booking/{booking_id}")
-        data = r.json()
-    return _fmt_booking(data) if data.get("success") else f"❌ {data.get('error', 'Unknown error')}"
+    data = await _call_api("get_booking", "POST", f"/hotel/booking/{booking_id}")
+    return _result(data, format, _fmt_booking, _summarize_booking)
 
 # ------------------ WEATHER TOOLS ------------------ #
 
-@mcp.tool
-def get_current_weather(location:str) -> str:
+@mcp.tool(output_schema=CURRENT_WEATHER_OUTPUT)
+async def get_current_weather(location:str, format: OutputFormat = "summary") -> ToolResult:
     """Get current weather for a location"""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.get("/weather/current", params={"location": location})
-        data = r.json()
-    return _format_current_weather(data) if data.get("success") else f"❌ {data.get('error', 'Unknown error')}"
+    data = await _call_api("get_current_weather", "GET", "/weather/current", params={"location": location})
+    return _result(data, format, _format_current_weather, _summarize_current_weather)
 
 
 
 
-@mcp.tool
-def get_weather_forecast(location: str, 
-                         days: Annotated[int,Field(description="Number of days of forecast needed", ge=1, le=7)]=5 ) -> str:
+@mcp.tool(output_schema=WEATHER_FORECAST_OUTPUT)
+async def get_weather_forecast(location: str, 
+                               days: Annotated[int,Field(description="Number of days of forecast needed", ge=1, le=7)]=5,
+                               format: OutputFormat = "summary") -> ToolResult:
     """Weather forecast for a location for given number of days. Defaults to 5 days."""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.get("/weather/forecast", params={"location": location, "days": days})
-        data = r.json()
-    return _format_weather_forecast(data, days) if data.get("success") else f"❌ {data.get('error', 'Unknown error')}"
+    data = await _call_api("get_weather_forecast", "GET", "/weather/forecast", params={"location": location, "days": days})
+    return _result(data, format, lambda d: _format_weather_forecast(d, days), _summarize_weather_forecast)
 
 
-@mcp.tool
-def get_weather_alerts(location:str) -> str:
+@mcp.tool(output_schema=WEATHER_ALERTS_OUTPUT)
+async def get_weather_alerts(location:str, format: OutputFormat = "summary") -> ToolResult:
     """Weather alerts for a location"""
-    with httpx.Client(base_url=API_BASE, timeout=30.0) as http:
-        r = http.get("/weather/alerts", params={"location": location})
-        data = r.json()
-    return _format_weather_alerts(data) if data.get("success") else f"❌ {data.get('error', 'Unknown error')}"
+    data = await _call_api("get_weather_alerts", "GET", "/weather/alerts", params={"location": location})
+    return _result(data, format, _format_weather_alerts, _summarize_weather_alerts)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+"""
+Hotel Search Cache
+LRU cache of search results, each tagged with the inventory version it
+was computed at and the hotels it lists, so a booking only invalidates
+results containing the booked hotel
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+
+class _Entry:
+    __slots__ = ("result", "version", "hotel_ids")
+
+    def __init__(self, result: Dict, version: int, hotel_ids: FrozenSet[str]):
+        self.result = result
+        self.version = version
+        self.hotel_ids = hotel_ids
+
+
+class SearchCache:
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Results kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, key: Hashable,
+            changed_since: Callable[[int], Tuple[int, Set[str]]]) -> Optional[Dict]:
+        """
+        Cached result for key, if none of its hotels changed since it was stored
+
+        Args:
+            changed_since: Returns (current version, hotels changed after a version)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+
+        version, changed = changed_since(entry.version)
+        with self._lock:
+            if changed & entry.hotel_ids:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+                return None
+            # Still valid at the newer version; later checks scan fewer changes
+            entry.version = max(entry.version, version)
+            self.stats["hits"] += 1
+        return entry.result
+
+    def put(self, key: Hashable, result: Dict, version: int, hotel_ids: Iterable[str]):
+        """
+        Store a result computed at an inventory version
+
+        Args:
+            hotel_ids: Hotels the result lists; a change to any of them invalidates it
+        """
+        with self._lock:
+            self._entries[key] = _Entry(result, version, frozenset(hotel_ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
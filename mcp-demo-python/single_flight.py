@@ -0,0 +1,109 @@
+"""
+Request Coalescing
+Identical concurrent read requests share one in-flight call and all get
+its result. SingleFlight is for threaded code (the FastAPI routes),
+AsyncSingleFlight for asyncio code (the MCP server).
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+
+def make_key(route: str, fold_case: Iterable[str] = (), **arguments) -> str:
+    """
+    Coalescing key for a route and its arguments
+
+    Argument order is ignored. Strings under the names in fold_case (free
+    text such as a location, at any depth) are trimmed and case-folded, so
+    "Miami" and " miami" share a call; everything else, IDs included, must
+    match exactly.
+    """
+    folded = frozenset(fold_case)
+
+    def normalize(value, fold: bool):
+        if isinstance(value, str):
+            return value.strip().casefold() if fold else value
+        if isinstance(value, dict):
+            return {k: normalize(v, k in folded) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v, fold) for v in value]
+        return value
+    return route + "?" + json.dumps(normalize(arguments, False), sort_keys=True, default=str)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for the identical call already running and return its result"""
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn(), or the identical call already running
+
+        The shared call runs as its own task, so a waiter being cancelled
+        doesn't cancel the call for everyone else.
+        """
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.stats["executed"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
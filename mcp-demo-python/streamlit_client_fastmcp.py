@@ -5,9 +5,17 @@ import re
 import asyncio
 from fastmcp import Client
 from fastmcp.client.transports import StreamableHttpTransport
+from chat_history import ChatHistory, render as render_history
 
 OLLAMA_URL = "http://localhost:11434"
 MCP_SERVER_URL = "http://localhost:5000/mcp"   # FastMCP default mcp path
+HISTORY_PAGE = 20   # messages drawn per rerun; older ones load on request
+
+# Parameters the tools can do without; the model sends them as null
+OPTIONAL_PARAMS = {
+    "search_hotels": {"location", "latitude", "longitude", "radius_km", "nearest"},
+    "get_weather_forecast": {"days"},
+}
 
 
 # Configure Streamlit page
@@ -17,8 +25,8 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
+if 'history' not in st.session_state:
+    st.session_state.history = ChatHistory()
 
 
 # Sidebar configuration
@@ -54,18 +62,17 @@ You can ask about:
 This demo uses a mock API server and a local `gemma3` model via [Ollama](https://ollama.com/).
 """)
 
-# Chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Chat history: only the latest page is drawn, so reruns stay fast in long sessions
+render_history(st.session_state.history, HISTORY_PAGE)
+
 
-        
 # Show available tools
 if st.button("🔍 Show Available Tools"):
     st.subheader("Available Tools")
     for tool in available_tools: #tools:
         st.markdown(f"- **{tool.name}**: {tool.description}")
-        st.session_state.messages.append({"role": "system", "content": tool.name + ": " + tool.description})
+        # Kept once per tool however often the button is pressed
+        st.session_state.history.set_system(tool.name, tool.description)
 
 
 st.subheader("Ask Something")
@@ -86,8 +93,9 @@ Possible intents:
 - "get_weather_alerts": User wants weather alerts
 - "general": General conversation or unclear intent
 
-For hotel searches, extract: location, check_in (YYYY-MM-DD), check_out (YYYY-MM-DD), guests (number)
-For hotel booking, extract: hotel_id, check_in, check_out, guests, guest_name, guest_email. if user provides a hotel name, find the hotel ID using the hotel name
+For hotel searches, extract: location, check_in (YYYY-MM-DD), check_out (YYYY-MM-DD), guests (number), and when the user asks for hotels near a place: radius_km (number, "within 5 km") and/or nearest (number of hotels, "closest 10"), plus latitude and longitude only if the user gives coordinates
+For hotel details, extract: name (hotel name or hotel ID)
+For hotel booking, extract: hotel_id, check_in, check_out, guests, guest_name, guest_email. if user provides a hotel name, put the hotel name in hotel_id
 For booking lookup, extract: booking_id
 For weather requests, extract: location, days (for forecast, 1-7)
 
@@ -96,6 +104,7 @@ If information is missing, set the field to null.
 
 Example responses:
 {"tool": "search_hotels", "location": "New York", "check_in": "2024-02-15", "check_out": "2024-02-17", "guests": 2}
+{"tool": "search_hotels", "location": "Denver", "check_in": "2024-02-15", "check_out": "2024-02-17", "guests": 1, "radius_km": 5}
 {"tool": "get_current_weather", "location": "Miami"}
 {"tool": "general", "message": "I need more information to help you"}
 """
@@ -124,8 +133,30 @@ Example responses:
     return {"tool": None, "params": {}}
 
 
+def pick_hotel(query: str, candidates: list):
+    """
+    The candidate a booking request clearly names, or None when the user has to choose
+
+    A hotel ID or full name picks that hotel. Otherwise the one candidate
+    holding every word of the request wins; words several hotels share
+    ("Hotel") pick nothing. A sole candidate may match with a typo.
+    """
+    if not candidates:
+        return None
+    wanted = " ".join(query.casefold().split())
+    named = [c for c in candidates
+             if c["id"] == query.strip() or " ".join(c["name"].casefold().split()) == wanted]
+    if named:
+        return named[0] if len(named) == 1 else None
+    if len(candidates) == 1:
+        return candidates[0] if candidates[0]["match"] != "partial" else None
+    exact = [c for c in candidates if c["match"] == "exact"]
+    return exact[0] if len(exact) == 1 else None
+
+
 def unwrap_tool_result(resp):
-    # FastMCP returns CallToolResult with content list of TextContent
+    # FastMCP returns CallToolResult with content list of TextContent;
+    # the raw data is also on resp.structured_content
     if resp.content:
         return "\n\n".join(tc.text for tc in resp.content)
     return str(resp)
@@ -133,8 +164,9 @@ def unwrap_tool_result(resp):
 
 # Process user input
 if user_input:= st.chat_input("Ask me about hotels or weather!"):
-    # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    # Add user message to chat history; the view jumps back to the latest page
+    st.session_state.history.add("user", user_input)
+    st.session_state.history_shown = HISTORY_PAGE
     with st.chat_message("user"):
         st.markdown(user_input)
 
@@ -144,6 +176,8 @@ if user_input:= st.chat_input("Ask me about hotels or weather!"):
 
         tool = intent.get("tool")
         params = intent.get("params", {})
+        optional = OPTIONAL_PARAMS.get(tool, set())
+        params = {k: v for k, v in params.items() if v is not None or k not in optional}
 
     if not tool:
         st.warning("Sorry, I couldn't understand what you need.")
@@ -158,14 +192,28 @@ if user_input:= st.chat_input("Ask me about hotels or weather!"):
                 transport = StreamableHttpTransport(url=MCP_SERVER_URL)
                 async def call():
                     async with Client(transport) as client:
-
-                        call_result = await client.call_tool(tool, params)
+                        if tool == "book_hotel" and params.get("hotel_id"):
+                            # hotel_id may be a name; let the server resolve it, but
+                            # never book a guess: ask when the match isn't clear
+                            lookup = await client.call_tool("get_hotel", {"name": params["hotel_id"], "limit": 5,
+                                                                         "format": "markdown"})
+                            candidates = lookup.structured_content.get("candidates", [])
+                            match = pick_hotel(params["hotel_id"], candidates)
+                            if match:
+                                params["hotel_id"] = match["id"]
+                            elif candidates:
+                                return ("🤔 Which hotel did you mean? Nothing has been booked yet.\n\n"
+                                        + unwrap_tool_result(lookup)
+                                        + "\n\nPlease ask again with the hotel ID.")
+
+                        # The chat shows the markdown rendering, whatever the server's default
+                        call_result = await client.call_tool(tool, {**params, "format": "markdown"})
                         return unwrap_tool_result(call_result)
                 result = asyncio.run(call())
 
             st.success("✅ Response:")
             st.markdown(result)
-            st.session_state.messages.append({"role": "assistant", "content": result})
+            st.session_state.history.add("assistant", result)
 
 
 
@@ -188,5 +236,6 @@ st.sidebar.markdown("""
 
 # Clear chat button
 if st.sidebar.button("🗑️ Clear Chat"):
-    st.session_state.messages = []
+    st.session_state.history.clear()
+    st.session_state.history_shown = HISTORY_PAGE
     st.rerun()
\ No newline at end of file
@@ -5,26 +5,21 @@ Simulates a weather service with current conditions and forecasts
 
 from datetime import datetime, timedelta
 import random
-from typing import Dict, List
+from typing import Dict, List, Optional
+from catalog import sample_climates
 
 class Weather:
-    def __init__(self):
+    def __init__(self, city_base_temps: Optional[Dict[str, Dict]] = None):
+        """
+        Args:
+            city_base_temps: Base temperature and variation by lower-case city
+                name, usually a catalog's climates; defaults to the sample catalog's
+        """
         self.weather_conditions = [
             "sunny", "partly cloudy", "cloudy", "light rain", 
             "heavy rain", "thunderstorm", "snow", "foggy"
         ]
-        self.city_base_temps = {
-            "new york": {"base": 15, "variation": 15},
-            "miami": {"base": 25, "variation": 8},
-            "denver": {"base": 10, "variation": 20},
-            "chicago": {"base": 12, "variation": 18},
-            "los angeles": {"base": 22, "variation": 10},
-            "seattle": {"base": 13, "variation": 12},
-            "phoenix": {"base": 30, "variation": 15},
-            "boston": {"base": 14, "variation": 16},
-            "san francisco": {"base": 18, "variation": 8},
-            "atlanta": {"base": 20, "variation": 12}
-        }
+        self.city_base_temps = sample_climates() if city_base_temps is None else city_base_temps
     
     def _generate_temperature(self, location: str, season_modifier: float = 0) -> int:
         """Generate realistic temperature for a location"""
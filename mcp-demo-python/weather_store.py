@@ -0,0 +1,94 @@
+"""
+Weather Data Store
+Keeps current conditions, forecasts and alerts for known cities generated
+ahead of time and serialized, refreshed by a background thread
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from weather import Weather
+
+MAX_FORECAST_DAYS = 7
+
+
+def _key(location: str) -> str:
+    return location.strip().casefold()
+
+
+class WeatherStore:
+    def __init__(self, weather: Weather, locations: Iterable[str], refresh_seconds: float = 300.0):
+        """
+        Args:
+            weather: Generator used for refreshes
+            locations: Cities kept warm; any other location is not stored
+            refresh_seconds: Interval between background refreshes
+        """
+        self.weather = weather
+        self.locations = {_key(loc): loc for loc in locations}
+        self.refresh_seconds = refresh_seconds
+        self.refreshed_at: Optional[float] = None
+        self.refresh_duration = 0.0
+        self._payloads: Dict[Tuple[str, str, int], bytes] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_locations(self, locations: Iterable[str]):
+        """Replace the cities kept warm and refresh them now"""
+        self.locations = {_key(loc): loc for loc in locations}
+        self.refresh()
+
+    def refresh(self):
+        """Regenerate every stored payload and swap them in at once"""
+        started = time.monotonic()
+        payloads = {}
+        for key, location in self.locations.items():
+            payloads[("current", key, 0)] = self._serialize(self.weather.get_current_weather(location))
+            payloads[("alerts", key, 0)] = self._serialize(self.weather.get_weather_alerts(location))
+
+            # One 7-day forecast per city; shorter forecasts are its first days
+            forecast = self.weather.get_forecast(location, MAX_FORECAST_DAYS)
+            for days in range(1, MAX_FORECAST_DAYS + 1):
+                payloads[("forecast", key, days)] = self._serialize({
+                    **forecast, "forecast_days": days, "forecast": forecast["forecast"][:days]
+                })
+        self._payloads = payloads
+        self.refreshed_at = time.time()
+        self.refresh_duration = time.monotonic() - started
+
+    @staticmethod
+    def _serialize(data: Dict) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode()
+
+    def payload(self, kind: str, location: str, days: int = 0) -> Optional[bytes]:
+        """
+        Stored JSON for "current", "forecast" or "alerts"
+
+        Returns:
+            Serialized response body, or None when the location (or day
+            count) isn't kept warm and must be generated on demand
+        """
+        return self._payloads.get((kind, _key(location), days))
+
+    def start(self):
+        """Fill the store now, then keep refreshing in the background"""
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="weather-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous payloads; the next interval retries
+                print(f"Weather refresh failed: {e}")